@@ -0,0 +1,210 @@
+"""Measure the per-request overhead that `web_auth.permissions` adds to a view, for each bridge.
+
+The cases vary the catalog size, the bitmask length, the number of required permissions, the aggregation type, and
+whether the token is granted, denied, or malformed. The results are saved as JSON, so that a release can be compared
+with the previous one.
+
+Usage:
+    python -m benchmark.access_control [--bridges fastapi flask django] [--output FILE] [--compare FILE]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+import web_auth
+from web_auth import AuthException, Config, JsonFileStorage, PermissionAggregationTypeEnum
+
+from .common import get_bridge_class, make_catalog_file, make_jwt_token
+
+BRIDGES = ('fastapi', 'flask', 'django')
+CATALOG_SIZES = (100, 3000)
+BITMASK_LENS = (96, 3072)
+REQUIRED_COUNTS = (1, 8)
+AGGREGATION_TYPES = (PermissionAggregationTypeEnum.ALL, PermissionAggregationTypeEnum.ANY)
+OUTCOMES = ('granted', 'denied', 'bad_token')
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+REGRESSION_THRESHOLD = 1.1
+
+
+def make_tokens(bitmask_len: int, required_idx: list[int]) -> dict[str, str]:
+    other_idx = [i for i in range(bitmask_len) if i not in required_idx][: len(required_idx)]
+    return {
+        'granted': make_jwt_token(bitmask_len, required_idx),
+        'denied': make_jwt_token(bitmask_len, other_idx),
+        'bad_token': 'not-a-jwt-token',
+    }
+
+
+def make_runner(bridge_name: str, context, permissions: list[str], aggregation_type, token: str):
+    """Return a callable running the decorated view `number` times and returning the elapsed seconds."""
+    decorate = context(permissions, aggregation_type=aggregation_type)
+    bearer_token = f'Bearer {token}'
+
+    if bridge_name == 'fastapi':
+        from starlette.requests import Request
+
+        async def view():
+            return None
+
+        wrapper = decorate(view)
+        request = Request(
+            {
+                'type': 'http',
+                'method': 'GET',
+                'path': '/',
+                'query_string': b'',
+                'headers': [(b'authorization', bearer_token.encode())],
+            }
+        )
+
+        async def run_async(number: int) -> float:
+            start = time.perf_counter()
+            for _ in range(number):
+                try:
+                    await wrapper(_request_=request)
+                except AuthException:
+                    pass
+            return time.perf_counter() - start
+
+        return lambda number: asyncio.run(run_async(number))
+
+    if bridge_name == 'flask':
+        from flask import Flask
+
+        app = Flask('benchmark')
+        wrapper = decorate(lambda: None)
+
+        def run(number: int) -> float:
+            with app.test_request_context(headers={'Authorization': bearer_token}):
+                start = time.perf_counter()
+                for _ in range(number):
+                    try:
+                        wrapper()
+                    except AuthException:
+                        pass
+                return time.perf_counter() - start
+
+        return run
+
+    from django.test import RequestFactory
+
+    wrapper = decorate(lambda request: None)
+    request = RequestFactory().get('/', HTTP_AUTHORIZATION=bearer_token)
+
+    def run(number: int) -> float:
+        start = time.perf_counter()
+        for _ in range(number):
+            try:
+                wrapper(request)
+            except AuthException:
+                pass
+        return time.perf_counter() - start
+
+    return run
+
+
+def run_benchmarks(bridges: list[str], number: int, repeat: int) -> list[dict]:
+    results = []
+    for catalog_size in CATALOG_SIZES:
+        permission_file_path = make_catalog_file(catalog_size)
+        try:
+            for bridge_name in bridges:
+                context = Config.make_context(
+                    bridge_class=get_bridge_class(bridge_name),
+                    storage_class=JsonFileStorage,
+                    storage_params={'ttl': 3600, 'permission_file_path': permission_file_path},
+                )
+                for bitmask_len, required_count in itertools.product(BITMASK_LENS, REQUIRED_COUNTS):
+                    limit = min(catalog_size, bitmask_len)
+                    required_idx = [k * (limit // required_count) for k in range(required_count)]
+                    permissions = [f'perm_{i}' for i in required_idx]
+                    tokens = make_tokens(bitmask_len, required_idx)
+                    for aggregation_type, outcome in itertools.product(AGGREGATION_TYPES, OUTCOMES):
+                        run = make_runner(bridge_name, context, permissions, aggregation_type, tokens[outcome])
+                        run(max(number // 10, 1))  # warm up
+                        elapsed = min(run(number) for _ in range(repeat))
+                        result = {
+                            'bridge': bridge_name,
+                            'catalog_size': catalog_size,
+                            'bitmask_len': bitmask_len,
+                            'required_count': required_count,
+                            'aggregation_type': aggregation_type.value,
+                            'outcome': outcome,
+                            'us_per_request': round(elapsed / number * 1e6, 3),
+                        }
+                        print(format_result(result))
+                        results.append(result)
+        finally:
+            os.remove(permission_file_path)
+    return results
+
+
+def get_case_key(result: dict) -> tuple:
+    return tuple(v for k, v in result.items() if k != 'us_per_request')
+
+
+def format_result(result: dict, baseline: dict = None) -> str:
+    line = (
+        f'{result["bridge"]:>8} catalog={result["catalog_size"]:<5} bits={result["bitmask_len"]:<5}'
+        f' required={result["required_count"]:<2} {result["aggregation_type"]:<3} {result["outcome"]:<9}'
+        f' {result["us_per_request"]:>9.2f} us'
+    )
+    if baseline:
+        ratio = result['us_per_request'] / baseline['us_per_request']
+        line += f' {ratio:>6.2f}x' + ('  REGRESSION' if ratio > REGRESSION_THRESHOLD else '')
+    return line
+
+
+def compare(results: list[dict], baseline_path: str) -> int:
+    """Print the results against a baseline and return the number of regressions."""
+    with open(baseline_path, encoding='utf8') as fp:
+        baseline = json.load(fp)
+    print(f'\nCompared with {baseline["version"]} ({baseline["timestamp"]}):')
+    baseline_results = {get_case_key(r): r for r in baseline['results']}
+    regressions = 0
+    for result in results:
+        baseline_result = baseline_results.get(get_case_key(result))
+        if baseline_result:
+            print(format_result(result, baseline_result))
+            regressions += result['us_per_request'] > baseline_result['us_per_request'] * REGRESSION_THRESHOLD
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bridges', nargs='+', choices=BRIDGES, default=list(BRIDGES))
+    parser.add_argument('--number', type=int, default=1000, help='requests per timing')
+    parser.add_argument('--repeat', type=int, default=3, help='timings per case, the best one is kept')
+    parser.add_argument('--output', default=os.path.join(RESULTS_DIR, f'{web_auth.__version__}.json'))
+    parser.add_argument('--compare', help='a previously saved result file to compare with')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.bridges, args.number, args.repeat)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf8') as fp:
+        json.dump(
+            {
+                'version': web_auth.__version__,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'results': results,
+            },
+            fp,
+            indent=2,
+        )
+    print(f'Saved to {args.output}')
+
+    if args.compare and compare(results, args.compare):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Compare the cost of rejecting a bot that replays a pool of bad tokens: garbage, expired and forged tokens, with the
+rejected token cache disabled and enabled, and with and without a `JWTVerifier`.
+
+Usage: python -m benchmark.attack
+"""
+import time
+import timeit
+
+import jwt
+
+from web_auth import AuthException, Config, JsonFileStorage
+from web_auth.fastapi import FastapiBridge
+
+from .common import make_catalog_file, make_jwt_token
+
+NUMBER = 20000
+POOL_SIZE = 256
+SECRET_KEY = 'benchmark-secret-key-of-32-bytes'
+
+
+def make_bad_tokens() -> list[str]:
+    utc_now = int(time.time())
+    expired_payload = {'user_id': 1, 'permission_bitmask': 'AQ==', 'iat': utc_now - 7200, 'exp': utc_now - 3600}
+    tokens = []
+    for i in range(POOL_SIZE):
+        if i % 3 == 0:
+            tokens.append(f'garbage.{i}.' + 'x' * 300)
+        elif i % 3 == 1:
+            tokens.append(jwt.encode({**expired_payload, 'user_id': i}, SECRET_KEY))
+        else:
+            tokens.append(make_jwt_token(64, [i % 64])[:-4] + 'AAAA')  # a forged signature
+    return tokens
+
+
+def reject(bridge, tokens: list[str]):
+    for token in tokens:
+        try:
+            bridge.authenticate_jwt_token(token)
+        except AuthException:
+            pass
+
+
+def main():
+    catalog_file_path = make_catalog_file(64)
+    storage_params = {'ttl': 60, 'permission_file_path': catalog_file_path}
+    tokens = make_bad_tokens()
+
+    garbage_tokens = tokens[::3]
+    print(f'{"verifier":<10} {"rejected token cache":<22} {"time per rejection (us)":>24}')
+    # Without a verifier, the expired and forged tokens are accepted, so only the garbage is rejected
+    for verifier_name, jwt_params, bad_tokens in (
+        ('none', None, garbage_tokens),
+        ('HS256', {'algorithms': ['HS256'], 'key': SECRET_KEY}, tokens),
+    ):
+        rounds = NUMBER // len(bad_tokens)
+        for cache_name, rejected_token_cache_params in (('disabled', {'maxsize': 0}), ('enabled', None)):
+            context = Config.make_context(
+                bridge_class=FastapiBridge,
+                storage_class=JsonFileStorage,
+                storage_params=storage_params,
+                jwt_params=jwt_params,
+                rejected_token_cache_params=rejected_token_cache_params,
+            )
+            reject(context.bridge, bad_tokens)  # warm up, which fills the enabled cache
+            timing = min(timeit.repeat(lambda: reject(context.bridge, bad_tokens), number=rounds, repeat=5))
+            print(f'{verifier_name:<10} {cache_name:<22} {timing / (rounds * len(bad_tokens)) * 1e6:>24.2f}')
+
+
+if __name__ == '__main__':
+    main()
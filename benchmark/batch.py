@@ -0,0 +1,81 @@
+"""Compare authorizing many requirements one by one with `BitmaskAuthorization.authorize_many`.
+
+Usage: python -m benchmark.batch
+"""
+import base64
+import random
+import timeit
+
+from web_auth import (
+    AuthException,
+    BitmaskAuthorization,
+    Config,
+    Consumer,
+    JsonFileStorage,
+    PermissionAggregationTypeEnum,
+    PermissionBatch,
+)
+
+from .common import get_bridge_class, make_catalog_file
+
+CATALOG_SIZE = 3072
+BATCH_SIZES = (10, 100, 300, 1000)
+REQUIRED_PERMISSION_COUNT = 3
+NUMBER = 200
+
+
+def make_requirements(batch_size: int, seed: int = 0) -> list[tuple[set[str], PermissionAggregationTypeEnum]]:
+    rnd = random.Random(seed)
+    return [
+        (
+            {f'perm_{i}' for i in rnd.sample(range(CATALOG_SIZE), REQUIRED_PERMISSION_COUNT)},
+            rnd.choice([PermissionAggregationTypeEnum.ALL, PermissionAggregationTypeEnum.ANY]),
+        )
+        for _ in range(batch_size)
+    ]
+
+
+def authorize_one_by_one(authorization: BitmaskAuthorization, consumer: Consumer, requirements) -> list[bool]:
+    granted = []
+    for permissions, aggregation_type in requirements:
+        try:
+            authorization.authorize(consumer, permissions, aggregation_type)
+            granted.append(True)
+        except AuthException:
+            granted.append(False)
+    return granted
+
+
+def main():
+    context = Config.make_context(
+        bridge_class=get_bridge_class('fastapi'),
+        storage_class=JsonFileStorage,
+        storage_params={'ttl': 3600, 'permission_file_path': make_catalog_file(CATALOG_SIZE)},
+    )
+    authorization = BitmaskAuthorization(context)
+    granted = random.Random(0).getrandbits(CATALOG_SIZE)
+    consumer = Consumer(
+        permission_bitmask=base64.b64encode(granted.to_bytes(CATALOG_SIZE // 8, 'big')).decode(), user=None
+    )
+
+    print(f'{"batch":>6} {"one by one (us)":>16} {"int batch (us)":>15} {"numpy batch (us)":>17}')
+    for batch_size in BATCH_SIZES:
+        requirements = make_requirements(batch_size)
+        int_batch, numpy_batch = PermissionBatch(requirements), PermissionBatch(requirements)
+        int_batch.NUMPY_MIN_SIZE, numpy_batch.NUMPY_MIN_SIZE = batch_size + 1, 0
+        expected = authorize_one_by_one(authorization, consumer, requirements)
+        assert authorization.authorize_many(consumer, int_batch) == expected
+        cases = [
+            lambda: authorize_one_by_one(authorization, consumer, requirements),
+            lambda: authorization.authorize_many(consumer, int_batch),
+        ]
+        if numpy_batch.compile(context.storage)[2] is not None:
+            assert authorization.authorize_many(consumer, numpy_batch) == expected
+            cases.append(lambda: authorization.authorize_many(consumer, numpy_batch))
+        timings = [min(timeit.repeat(case, number=NUMBER, repeat=5)) / NUMBER * 1e6 for case in cases]
+        numpy_timing = f'{timings[2]:>17.1f}' if len(timings) > 2 else f'{"n/a":>17}'
+        print(f'{batch_size:>6} {timings[0]:>16.1f} {timings[1]:>15.1f} {numpy_timing}')
+
+
+if __name__ == '__main__':
+    main()
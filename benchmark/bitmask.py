@@ -0,0 +1,59 @@
+"""Compare the string-based and the integer-based bitmask checks of `BitmaskAuthorization`.
+
+Usage: python -m benchmark.bitmask
+"""
+import base64
+import random
+import timeit
+
+from web_auth import BitmaskAuthorization, PermissionAggregationTypeEnum, PermissionModel
+
+BITMASK_SIZES = (48, 384, 3072, 6144)
+REQUIRED_PERMISSION_COUNT = 3
+NUMBER = 2000
+
+
+def make_case(bitmask_size: int, seed: int = 0):
+    rnd = random.Random(seed)
+    permission_models = [
+        PermissionModel(bitmask_idx=i, codename=f'perm_{i}', name=None, service=None) for i in range(bitmask_size)
+    ]
+    granted = rnd.getrandbits(bitmask_size) | (1 << (bitmask_size - 1))
+    base64encoded_bitmask = base64.b64encode(granted.to_bytes(bitmask_size // 8, 'big')).decode()
+    permissions = {
+        f'perm_{i}' for i in rnd.sample([i for i in range(bitmask_size) if granted >> i & 1], REQUIRED_PERMISSION_COUNT)
+    }
+    # `BitmaskAuthorization.authorize` only passes the models of the required permissions
+    return base64encoded_bitmask, permissions, [p for p in permission_models if p.codename in permissions]
+
+
+def check_by_string(base64encoded_bitmask, permissions, permission_models):
+    BitmaskAuthorization.check_permissions(
+        permissions,
+        PermissionAggregationTypeEnum.ALL,
+        BitmaskAuthorization.convert_base64encoded_to_bitmask(base64encoded_bitmask),
+        permission_models,
+    )
+
+
+def check_by_int(base64encoded_bitmask, permissions, permission_models):
+    BitmaskAuthorization.check_permission_mask(
+        BitmaskAuthorization.make_permission_mask(permissions, permission_models),
+        PermissionAggregationTypeEnum.ALL,
+        *BitmaskAuthorization.convert_base64encoded_to_int(base64encoded_bitmask),
+    )
+
+
+def main():
+    print(f'{"bits":>6} {"string (us)":>12} {"int (us)":>10} {"speedup":>8}')
+    for bitmask_size in BITMASK_SIZES:
+        case = make_case(bitmask_size)
+        timings = [
+            min(timeit.repeat(lambda: check(*case), number=NUMBER, repeat=5)) / NUMBER * 1e6
+            for check in (check_by_string, check_by_int)
+        ]
+        print(f'{bitmask_size:>6} {timings[0]:>12.2f} {timings[1]:>10.2f} {timings[0] / timings[1]:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Compare loading and looking up a large catalog with `JsonFileStorage` and `BinaryFileStorage`.
+
+Usage: python -m benchmark.catalog
+"""
+import os
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+from web_auth import BinaryFileStorage, JsonFileStorage
+from web_auth.core.binary import convert_json_to_binary
+
+from .common import make_catalog_file
+
+CATALOG_SIZE = 100000
+NUMBER = 20000
+
+
+def measure_load(storage_class, file_path: str):
+    tracemalloc.start()
+    start = time.perf_counter()
+    storage = storage_class(ttl=3600, permission_file_path=file_path)
+    elapsed = time.perf_counter() - start
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return storage, elapsed, retained
+
+
+def main():
+    json_file_path = make_catalog_file(CATALOG_SIZE)
+    fd, binary_file_path = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    convert_json_to_binary(json_file_path, binary_file_path)
+
+    print(f'{"storage":<18} {"load (ms)":>10} {"memory (KiB)":>13} {"lookup (us)":>12}')
+    for storage_class, file_path in ((JsonFileStorage, json_file_path), (BinaryFileStorage, binary_file_path)):
+        storage, elapsed, retained = measure_load(storage_class, file_path)
+        lookup = min(timeit.repeat(lambda: storage.get_permission('perm_54321'), number=NUMBER, repeat=5)) / NUMBER
+        print(f'{storage_class.__name__:<18} {elapsed * 1e3:>10.1f} {retained / 1024:>13.0f} {lookup * 1e6:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
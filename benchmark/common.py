@@ -0,0 +1,57 @@
+import base64
+import json
+import os
+import tempfile
+import time
+from typing import Iterable
+
+import jwt
+
+
+def make_catalog_file(catalog_size: int) -> str:
+    """Write a catalog of `perm_0` ... `perm_{catalog_size - 1}` into a temporary file and return its path."""
+    fd, file_path = tempfile.mkstemp(suffix='.json')
+    with os.fdopen(fd, 'w', encoding='utf8') as fp:
+        json.dump(
+            [{'bitmask_idx': i, 'codename': f'perm_{i}', 'name': None, 'service': None} for i in range(catalog_size)],
+            fp,
+        )
+    return file_path
+
+
+def make_jwt_token(bitmask_len: int, granted_idx: Iterable[int]) -> str:
+    """Make a token whose `permission_bitmask` is `bitmask_len` bits long and grants the `granted_idx`."""
+    bitmask = 0
+    for bitmask_idx in granted_idx:
+        bitmask |= 1 << bitmask_idx
+    utc_now = int(time.time())
+    return jwt.encode(
+        {
+            'user_id': 1,
+            'permission_bitmask': base64.b64encode(bitmask.to_bytes(bitmask_len // 8, 'big')).decode(),
+            'iat': utc_now,
+            'exp': utc_now + 3600,
+        },
+        'benchmark-secret-key-of-32-bytes',
+    )
+
+
+def get_bridge_class(bridge_name: str):
+    if bridge_name == 'fastapi':
+        from web_auth.fastapi import FastapiBridge
+
+        return FastapiBridge
+    if bridge_name == 'flask':
+        from web_auth.flask import FlaskBridge
+
+        return FlaskBridge
+
+    import django
+    from django.conf import settings
+
+    if not settings.configured:
+        settings.configure(ALLOWED_HOSTS=['*'])
+        django.setup()
+    from web_auth.django import DjangoBridge
+
+    return DjangoBridge
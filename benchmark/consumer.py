@@ -0,0 +1,69 @@
+"""Compare the per-request cost of creating a consumer from a JWT payload: an eager `JWTUser` with a `__dict__`
+consumer, as before, and the slotted `Consumer` whose user is built on first access.
+
+Usage: python -m benchmark.consumer
+"""
+import time
+import timeit
+import tracemalloc
+
+from web_auth import Consumer, JWTUser
+
+NUMBER = 20000
+
+
+class EagerConsumer(object):
+    """The consumer of the previous releases."""
+
+    def __init__(self, permission_bitmask, user, auth_scheme=None, credential=None):
+        self.permission_bitmask = permission_bitmask
+        self.user = user
+        self.auth_scheme = auth_scheme
+        self.credential = credential
+        self.effective_permissions = None
+
+
+def make_payload() -> dict:
+    utc_now = int(time.time())
+    return {'user_id': 1, 'permission_bitmask': '/////39/', 'iat': utc_now, 'exp': utc_now + 3600}
+
+
+def create_eager(payload: dict, token: str):
+    return EagerConsumer(payload['permission_bitmask'], JWTUser(**payload), 'JWT', token)
+
+
+def create_lazy(payload: dict, token: str):
+    return Consumer(payload['permission_bitmask'], auth_scheme='JWT', credential=token, user_payload=payload)
+
+
+def create_lazy_and_read_user(payload: dict, token: str):
+    consumer = create_lazy(payload, token)
+    _ = consumer.user
+    return consumer
+
+
+def measure_allocation(create, payload: dict, token: str) -> float:
+    """Return the bytes retained per consumer."""
+    tracemalloc.start()
+    snapshot = tracemalloc.take_snapshot()
+    consumers = [create(payload, token) for _ in range(1000)]
+    retained = sum(s.size_diff for s in tracemalloc.take_snapshot().compare_to(snapshot, 'filename'))
+    tracemalloc.stop()
+    del consumers
+    return retained / 1000
+
+
+def main():
+    payload, token = make_payload(), 'x' * 200
+    print(f'{"case":<28} {"time (us)":>10} {"bytes":>8}')
+    for name, create in (
+        ('eager user, __dict__', create_eager),
+        ('lazy user, __slots__', create_lazy),
+        ('lazy user, __slots__, read', create_lazy_and_read_user),
+    ):
+        timing = min(timeit.repeat(lambda: create(payload, token), number=NUMBER, repeat=5)) / NUMBER * 1e6
+        print(f'{name:<28} {timing:>10.2f} {measure_allocation(create, payload, token):>8.0f}')
+
+
+if __name__ == '__main__':
+    main()
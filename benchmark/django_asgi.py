@@ -0,0 +1,84 @@
+"""Compare the latency of a protected sync view and a protected `async def` view of `DjangoBridge` under ASGI.
+The sync view is run in a thread by Django, while the async view is awaited on the event loop.
+
+Usage: python -m benchmark.django_asgi
+"""
+import asyncio
+import time
+
+import django
+from django.conf import settings
+from django.http import JsonResponse
+
+from web_auth import Config, JsonFileStorage
+
+from .common import make_catalog_file, make_jwt_token
+
+CATALOG_SIZE = 100
+NUMBER = 1000
+
+urlpatterns = []
+
+
+async def run(application, path: str, headers: list[tuple[bytes, bytes]], number: int) -> float:
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(_):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(number):
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'root_path': '',
+            'query_string': b'',
+            'headers': headers,
+            'server': ('testserver', 80),
+            'client': ('testclient', 50000),
+        }
+        await application(scope, receive, send)
+    return time.perf_counter() - start
+
+
+def main():
+    if not settings.configured:
+        settings.configure(ALLOWED_HOSTS=['*'], ROOT_URLCONF=__name__)
+        django.setup()
+    from django.core.asgi import get_asgi_application
+    from django.urls import path
+
+    from web_auth.django import DjangoBridge
+
+    context = Config.make_context(
+        bridge_class=DjangoBridge,
+        storage_class=JsonFileStorage,
+        storage_params={'ttl': 3600, 'permission_file_path': make_catalog_file(CATALOG_SIZE)},
+    )
+
+    @context('perm_0')
+    def sync_view(request):
+        return JsonResponse([], safe=False)
+
+    @context('perm_0')
+    async def async_view(request):
+        return JsonResponse([], safe=False)
+
+    urlpatterns.extend([path('sync', sync_view), path('async', async_view)])
+    application = get_asgi_application()
+    headers = [(b'authorization', f'Bearer {make_jwt_token(96, [0])}'.encode())]
+
+    print(f'{"view":<6} {"latency (us)":>13}')
+    for name in ('sync', 'async'):
+        timing = min(asyncio.run(run(application, f'/{name}', headers, NUMBER)) for _ in range(5)) / NUMBER * 1e6
+        print(f'{name:<6} {timing:>13.1f}')
+
+
+if __name__ == '__main__':
+    main()
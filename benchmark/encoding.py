@@ -0,0 +1,42 @@
+"""Compare the claim size and the decoding time of the dense, sparse and run-length bitmask encodings, for a large
+catalog whose users hold a few scattered permissions, or a contiguous range of them. Every claim is decoded on every
+request. The encoding picked when none is given is starred.
+
+Usage: python -m benchmark.encoding
+"""
+import random
+import timeit
+
+from web_auth import BitmaskAuthorization, BitmaskEncodingEnum
+from web_auth.core.encoding import encode_permission_bitmask
+
+NUMBER = 20000
+CATALOG_SIZE = 6000
+
+
+def main():
+    rng = random.Random(0)
+    grants = (
+        ('20 scattered', rng.sample(range(CATALOG_SIZE), 20)),
+        ('200 scattered', rng.sample(range(CATALOG_SIZE), 200)),
+        ('range of 500', range(1000, 1500)),
+    )
+    print(f'{"granted":<14} {"encoding":<11} {"claim (chars)":>14} {"decode (us)":>12}  default')
+    for grant_name, granted_idx in grants:
+        default_claim = encode_permission_bitmask(granted_idx, CATALOG_SIZE)
+        for encoding in BitmaskEncodingEnum:
+            permission_bitmask = encode_permission_bitmask(granted_idx, CATALOG_SIZE, encoding)
+            timing = min(
+                timeit.repeat(
+                    lambda: BitmaskAuthorization.convert_base64encoded_to_int(permission_bitmask),
+                    number=NUMBER,
+                    repeat=5,
+                )
+            )
+            timing = timing / NUMBER * 1e6
+            default = '*' if permission_bitmask == default_claim else ''
+            print(f'{grant_name:<14} {encoding.value:<11} {len(permission_bitmask):>14} {timing:>12.2f}  {default}')
+
+
+if __name__ == '__main__':
+    main()
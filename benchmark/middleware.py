@@ -0,0 +1,95 @@
+"""Compare rejecting requests in the FastAPI view wrapper with rejecting them in the `AuthorizationMiddleware`,
+measured through the whole ASGI app.
+
+Usage: python -m benchmark.middleware
+"""
+import asyncio
+import time
+
+from fastapi import FastAPI
+from starlette.responses import JSONResponse
+
+from web_auth import AuthException, Config, ErrorMessageModel, JsonFileStorage
+from web_auth.fastapi import AuthorizationMiddleware, FastapiBridge
+
+from .common import make_catalog_file, make_jwt_token
+
+CATALOG_SIZE = 100
+NUMBER = 2000
+
+
+def make_apps(context):
+    wrapper_app = FastAPI()
+
+    @wrapper_app.exception_handler(AuthException)
+    async def exception_handler(_, exception: AuthException):
+        return JSONResponse(
+            status_code=403, content=ErrorMessageModel(code=exception.code, message=str(exception)).dict()
+        )
+
+    @wrapper_app.get('/tickets')
+    @context.permissions('perm_0')
+    async def get_tickets():
+        return 'Hello!'
+
+    middleware_app = FastAPI()
+
+    @middleware_app.get('/tickets')
+    async def get_tickets_behind_middleware():
+        return 'Hello!'
+
+    middleware_app.add_middleware(AuthorizationMiddleware, context=context, routes={('GET', '/tickets'): 'perm_0'})
+    return wrapper_app, middleware_app
+
+
+async def run(app, headers: list[tuple[bytes, bytes]], number: int) -> float:
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(_):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(number):
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': '/tickets',
+            'raw_path': b'/tickets',
+            'root_path': '',
+            'query_string': b'',
+            'headers': headers,
+            'server': ('testserver', 80),
+            'client': ('testclient', 50000),
+        }
+        await app(scope, receive, send)
+    return time.perf_counter() - start
+
+
+def main():
+    context = Config.make_context(
+        bridge_class=FastapiBridge,
+        storage_class=JsonFileStorage,
+        storage_params={'ttl': 3600, 'permission_file_path': make_catalog_file(CATALOG_SIZE)},
+    )
+    cases = {
+        'granted': [(b'authorization', f'Bearer {make_jwt_token(96, [0])}'.encode())],
+        'denied': [(b'authorization', f'Bearer {make_jwt_token(96, [1])}'.encode())],
+        'bad_token': [(b'authorization', b'Bearer not-a-jwt-token')],
+        'no_token': [],
+    }
+    wrapper_app, middleware_app = make_apps(context)
+    print(f'{"case":<10} {"wrapper (us)":>13} {"middleware (us)":>16}')
+    for name, headers in cases.items():
+        timings = [
+            min(asyncio.run(run(app, headers, NUMBER)) for _ in range(5)) / NUMBER * 1e6
+            for app in (wrapper_app, middleware_app)
+        ]
+        print(f'{name:<10} {timings[0]:>13.1f} {timings[1]:>16.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Measure the time to decorate N synthetic views with each bridge.
+
+Usage: python -m benchmark.startup [N]
+"""
+import os
+import sys
+import time
+
+from web_auth import Config, Consumer, JsonFileStorage
+
+from .common import get_bridge_class, make_catalog_file
+
+VIEW_COUNTS = (100, 1000, 4000)
+CATALOG_SIZE = 3000
+
+
+def make_views(bridge_name: str, view_count: int) -> list:
+    """Make `view_count` views, half of which inject the consumer."""
+    views = []
+    for i in range(view_count):
+        if bridge_name == 'fastapi':
+
+            async def view(item_id: int, consumer: Consumer):
+                return item_id
+
+            async def plain_view(item_id: int):
+                return item_id
+
+        elif bridge_name == 'flask':
+
+            def view(item_id: int, consumer: Consumer):
+                return item_id
+
+            def plain_view(item_id: int):
+                return item_id
+
+        else:
+
+            def view(request, item_id: int, consumer: Consumer):
+                return item_id
+
+            def plain_view(request, item_id: int):
+                return item_id
+
+        view = plain_view if i % 2 else view
+        view.__name__ = f'view_{i}'
+        views.append(view)
+    return views
+
+
+def measure(bridge_name: str, view_count: int, permission_file_path: str, repeat: int = 5) -> float:
+    """Return the best time of decorating `view_count` views with a fresh context."""
+    timings = []
+    for _ in range(repeat):
+        context = Config.make_context(
+            bridge_class=get_bridge_class(bridge_name),
+            storage_class=JsonFileStorage,
+            storage_params={'ttl': 60, 'permission_file_path': permission_file_path},
+        )
+        views = make_views(bridge_name, view_count)
+        start = time.perf_counter()
+        for i, view in enumerate(views):
+            # 1 in 4 views share their required permissions with another view
+            context([f'perm_{i % (view_count * 3 // 4)}', f'perm_{(i * 7) % CATALOG_SIZE}'])(view)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    view_counts = [int(sys.argv[1])] if len(sys.argv) > 1 else VIEW_COUNTS
+    permission_file_path = make_catalog_file(CATALOG_SIZE)
+    try:
+        print(f'{"bridge":>8} {"views":>6} {"total (ms)":>11} {"per view (us)":>14}')
+        for bridge_name in ('fastapi', 'flask', 'django'):
+            for view_count in view_counts:
+                elapsed = measure(bridge_name, view_count, permission_file_path)
+                print(f'{bridge_name:>8} {view_count:>6} {elapsed * 1e3:>11.1f} {elapsed / view_count * 1e6:>14.1f}')
+    finally:
+        os.remove(permission_file_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -15,9 +15,11 @@ Including another URLconf
 """
 from django.urls import path
 
-from .views import delete_tickets, list_tickets
+from .views import async_delete_tickets, async_list_tickets, delete_tickets, list_tickets
 
 urlpatterns = [
     path('list-tickets', list_tickets),
     path('delete-tickets', delete_tickets),
+    path('async-list-tickets', async_list_tickets),
+    path('async-delete-tickets', async_delete_tickets),
 ]
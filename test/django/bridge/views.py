@@ -1,6 +1,6 @@
 from django.http.response import JsonResponse
 
-from web_auth import AuthException, make_context
+from web_auth import AuthException, Consumer, make_context
 from web_auth.django import DjangoBridge
 
 context = make_context(
@@ -18,6 +18,16 @@ def error_handler(func):
     return wrapper
 
 
+def async_error_handler(func):
+    async def wrapper(*args, **kwargs):
+        try:
+            return await func(*args, **kwargs)
+        except AuthException as e:
+            return JsonResponse({'message': e.message, 'code': e.code}, status=403)
+
+    return wrapper
+
+
 @error_handler
 @context('view_ticket')
 def list_tickets(request):
@@ -28,3 +38,15 @@ def list_tickets(request):
 @context('delete_tickettype')
 def delete_tickets(request):
     return JsonResponse([], safe=False)
+
+
+@async_error_handler
+@context('view_ticket')
+async def async_list_tickets(request, consumer: Consumer):
+    return JsonResponse([consumer.user.user_id], safe=False)
+
+
+@async_error_handler
+@context('delete_tickettype')
+async def async_delete_tickets(request):
+    return JsonResponse([], safe=False)
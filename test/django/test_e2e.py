@@ -1,9 +1,10 @@
 import pytest
-from django.test import Client
+from django.test import AsyncClient, Client
 
 from web_auth import ErrorCode
 
 client = Client()
+async_client = AsyncClient()
 
 
 def test_list_tickets(bearer_jwt_token):
@@ -20,3 +21,22 @@ def test_delete_tickets(bearer_jwt_token):
     resp = client.delete('/delete-tickets', HTTP_AUTHORIZATION=bearer_jwt_token)
     assert resp.status_code == 403
     assert resp.json()['code'] == ErrorCode.PERMISSION_DENIED
+
+
+@pytest.mark.asyncio
+async def test_async_list_tickets(bearer_jwt_token, jwt_payload):
+    # `AsyncClient` goes through the ASGI handler, and its extras are ASGI header names on every Django version
+    resp = await async_client.get('/async-list-tickets', AUTHORIZATION=bearer_jwt_token)
+    assert resp.status_code == 200
+    assert resp.json() == [jwt_payload['user_id']]
+
+    resp = await async_client.get('/async-list-tickets')
+    assert resp.status_code == 403
+    assert resp.json()['code'] == ErrorCode.UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_async_delete_tickets(bearer_jwt_token):
+    resp = await async_client.delete('/async-delete-tickets', AUTHORIZATION=bearer_jwt_token)
+    assert resp.status_code == 403
+    assert resp.json()['code'] == ErrorCode.PERMISSION_DENIED
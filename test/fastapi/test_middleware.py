@@ -0,0 +1,93 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from web_auth import Config, ErrorCode, PermissionAggregationTypeEnum
+from web_auth.fastapi import AuthorizationMiddleware, FastapiBridge
+
+
+@pytest.fixture(scope='module')
+def client(jwt_payload):
+    context = Config.make_context(bridge_class=FastapiBridge, storage_params=Config.DEFAULT_STORAGE_PARAMS)
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.get('/tickets')
+    async def get_tickets(request: Request):
+        app.state.calls += 1
+        assert request.state.consumer.user.user_id == jwt_payload['user_id']
+        return 'Hello!'
+
+    @app.delete('/ticket-types/{ticket_type_id}')
+    async def delete_ticket_type(ticket_type_id: int):
+        app.state.calls += 1
+        return ticket_type_id
+
+    @app.get('/public')
+    async def public():
+        return 'Hello!'
+
+    @app.get('/me')
+    async def get_me(request: Request):
+        app.state.calls += 1
+        return request.state.consumer.user.user_id
+
+    @app.get('/ping')
+    async def ping():
+        app.state.calls += 1
+        return 'pong'
+
+    app.add_middleware(
+        AuthorizationMiddleware,
+        context=context,
+        routes={
+            ('GET', '/tickets'): 'view_ticket',
+            ('DELETE', '/ticket-types/{ticket_type_id}'): (
+                ['delete_tickettype', 'change_tickettype'],
+                PermissionAggregationTypeEnum.ALL,
+            ),
+            ('GET', '/me'): [],  # only requires authentication
+            ('*', '/ping'): (),
+        },
+    )
+    yield TestClient(app)
+
+
+def test_authorization_middleware(client, bearer_jwt_token, jwt_token):
+    response = client.get('/tickets', headers={'AUTHORIZATION': bearer_jwt_token})
+    assert response.status_code == 200
+    response = client.get('/tickets', params={'access_token': jwt_token})
+    assert response.status_code == 200
+    assert client.app.state.calls == 2
+
+    response = client.get('/tickets')
+    assert response.status_code == 401
+    assert response.json() == {'code': ErrorCode.UNAUTHORIZED, 'message': 'Unauthorized'}
+
+    response = client.get('/tickets', headers={'AUTHORIZATION': 'Bearer not-a-jwt'})
+    assert response.status_code == 401
+    assert response.json()['code'] == ErrorCode.BAD_JWT
+
+    response = client.delete('/ticket-types/1', headers={'AUTHORIZATION': bearer_jwt_token})
+    assert response.status_code == 403
+    assert response.json() == {'code': ErrorCode.PERMISSION_DENIED, 'message': 'Permission denied'}
+
+    # Rejected requests never reach the app
+    assert client.app.state.calls == 2
+
+    # Unlisted routes are passed through
+    assert client.get('/public').status_code == 200
+
+
+def test_authorization_middleware_authentication_only_routes(client, bearer_jwt_token, jwt_payload):
+    calls = client.app.state.calls
+    for path in ('/me', '/ping'):
+        response = client.get(path)
+        assert response.status_code == 401
+        assert response.json()['code'] == ErrorCode.UNAUTHORIZED
+    assert client.app.state.calls == calls
+
+    response = client.get('/me', headers={'AUTHORIZATION': bearer_jwt_token})
+    assert response.status_code == 200 and response.json() == jwt_payload['user_id']
+    assert client.get('/ping', headers={'AUTHORIZATION': bearer_jwt_token}).status_code == 200
+    assert client.app.state.calls == calls + 2
@@ -0,0 +1,177 @@
+import sys
+import threading
+
+import pytest
+
+from web_auth import (
+    AuthException,
+    BitmaskAuthorization,
+    CatalogSnapshot,
+    Config,
+    Consumer,
+    ErrorCode,
+    PermissionAggregationTypeEnum,
+    PermissionModel,
+    RequiredPermissions,
+    Storage,
+)
+
+CATALOG_SIZE = 64
+READERS = 4
+RELOADS = 300
+
+
+class RotatingStorage(Storage):
+    """Every reload shifts the bitmask indexes by one and stamps the generation on every model, so a catalog mixing
+    two generations, or a version not matching its generation, is detectable.
+    """
+
+    def __init__(self, ttl: int = 60, **kwargs):
+        self.generation = -1
+        super().__init__(ttl=ttl, **kwargs)
+
+    def _load_permissions(self) -> list[PermissionModel]:
+        self.generation += 1
+        return [
+            PermissionModel(
+                bitmask_idx=(i + self.generation) % CATALOG_SIZE,
+                codename=f'perm_{i}',
+                name=f'generation {self.generation}',
+                service=None,
+            )
+            for i in range(CATALOG_SIZE)
+        ]
+
+    def reload(self):
+        with self._refresh_lock:
+            self._reload_permissions()
+
+
+def check_snapshot(snapshot: CatalogSnapshot):
+    generation = snapshot.version - 1
+    catalog = snapshot.catalog
+    assert len(catalog.permission_models) == CATALOG_SIZE
+    for i, permission in enumerate(catalog.permission_models):
+        assert permission.name == f'generation {generation}'
+        assert permission.bitmask_idx == (i + generation) % CATALOG_SIZE
+        assert catalog.codename_index[permission.codename] is permission
+        assert catalog.bitmask_idx_index[permission.bitmask_idx] is permission
+
+
+def run_concurrently(writer, reader):
+    """Run the `writer` against `READERS` threads looping the `reader` until it's done, and re-raise the first
+    failure of any thread.
+    """
+    done = threading.Event()
+    failures = []
+
+    def read():
+        try:
+            while not done.is_set():
+                reader()
+        except BaseException as e:  # pylint: disable=broad-except
+            failures.append(e)
+            done.set()
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)  # interleave the threads as often as possible
+    threads = [threading.Thread(target=read) for _ in range(READERS)]
+    try:
+        for thread in threads:
+            thread.start()
+        writer()
+    finally:
+        done.set()
+        for thread in threads:
+            thread.join()
+        sys.setswitchinterval(switch_interval)
+    if failures:
+        raise failures[0]
+
+
+def test_readers_never_see_a_torn_snapshot():
+    storage = RotatingStorage()
+    last_versions = threading.local()
+
+    def reader():
+        snapshot = storage.snapshot
+        check_snapshot(snapshot)
+        # the version never goes backwards for a reader
+        assert snapshot.version >= getattr(last_versions, 'version', 0)
+        last_versions.version = snapshot.version
+
+    def writer():
+        for _ in range(RELOADS):
+            storage.reload()
+
+    run_concurrently(writer, reader)
+    assert storage.version == RELOADS + 1
+    check_snapshot(storage.snapshot)
+
+
+def test_snapshot_is_immutable():
+    snapshot = RotatingStorage().snapshot
+    with pytest.raises(AttributeError):
+        snapshot.version = 0
+
+
+def test_masks_and_effective_permissions_match_their_version(fake_web_bridge):
+    context = Config.make_context(
+        bridge_class=fake_web_bridge,
+        storage_class=RotatingStorage,
+        storage_params={'ttl': 60},
+        effective_permissions_cache_params={'maxsize': 0},  # look up the codenames every time
+    )
+    storage: RotatingStorage = context.storage
+    authorization = BitmaskAuthorization(context)
+    permissions = RequiredPermissions({'perm_0', 'perm_1'})
+
+    def reader():
+        authorization.get_permission_mask(permissions)
+        version, compiled_mask = permissions.compiled_mask
+        generation = version - 1
+        assert compiled_mask == (1 << generation % CATALOG_SIZE) | (1 << (generation + 1) % CATALOG_SIZE)
+
+        # Bit 0 grants `perm_i` such that `(i + generation) % CATALOG_SIZE == 0`
+        version = storage.version
+        effective_permissions = authorization.get_effective_permissions(Consumer(permission_bitmask='AAAAAAAAAAE='))
+        if storage.version == version:
+            assert effective_permissions == {f'perm_{-(version - 1) % CATALOG_SIZE}'}
+
+    def writer():
+        for _ in range(RELOADS):
+            storage.reload()
+
+    run_concurrently(writer, reader)
+
+
+def test_authorize_reads_one_snapshot(fake_web_bridge):
+    context = Config.make_context(
+        bridge_class=fake_web_bridge,
+        storage_class=RotatingStorage,
+        storage_params={'ttl': 60},
+        effective_permissions_cache_params={'maxsize': 0},
+    )
+    storage: RotatingStorage = context.storage
+    authorization = BitmaskAuthorization(context)
+    requirements = [RequiredPermissions({f'perm_{i}'}) for i in range(CATALOG_SIZE)]
+
+    def reader():
+        # Every bit but bit 0, which grants `perm_i` such that `(i + generation) % CATALOG_SIZE == 0`
+        consumer = Consumer(permission_bitmask='//////////4=')
+        permissions = requirements[-(storage.version - 1) % CATALOG_SIZE]
+        try:
+            authorization.authorize(consumer, permissions, PermissionAggregationTypeEnum.ALL)
+        except AuthException as e:
+            assert e.code == ErrorCode.PERMISSION_DENIED
+        else:
+            # Granted by a later catalog, whose bit 0 is another permission, rather than by a mask of one catalog
+            # and the codenames of another
+            assert consumer.effective_permissions.issuperset(permissions)
+            assert len(consumer.effective_permissions) == CATALOG_SIZE - 1
+
+    def writer():
+        for _ in range(RELOADS):
+            storage.reload()
+
+    run_concurrently(writer, reader)
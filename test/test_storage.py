@@ -0,0 +1,317 @@
+import dataclasses
+import hashlib
+import json
+import os
+import pathlib
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import pytest
+
+from web_auth import (
+    BinaryFileStorage,
+    HttpStorage,
+    JsonFileStorage,
+    SharedCatalogPublisher,
+    SharedCatalogStorage,
+)
+from web_auth.core.binary import BinaryCatalog, convert_json_to_binary
+from web_auth.core.watcher import InotifyWatcher
+
+
+class _CatalogHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        server.connections.add(self.client_address)
+        body = server.catalog
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            server.statuses.append(304)
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        server.statuses.append(200)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_catalog_server() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _CatalogHandler)
+    server.catalog = pathlib.Path('usr/etc/permissions.json').read_bytes()
+    server.connections = set()
+    server.statuses = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture()
+def catalog_server():
+    server = _start_catalog_server()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture()
+def unused_url():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f'http://127.0.0.1:{port}/permissions.json'
+
+
+def test_http_storage_conditional_get(catalog_server):
+    url = f'http://127.0.0.1:{catalog_server.server_port}/permissions.json'
+    storage = HttpStorage(ttl=0, permission_urls=[url])
+    try:
+        permission_models = storage.get_permissions()
+        assert 'view_order' in {p.codename for p in permission_models}
+        version = storage.version
+
+        # an unchanged catalog is revalidated with `304 Not Modified` over the same connection
+        assert storage.get_permissions() is permission_models
+        assert storage.version == version
+        assert catalog_server.statuses == [200, 304, 304]
+        assert len(catalog_server.connections) == 1
+
+        catalog_server.catalog = b'[{"bitmask_idx": 0, "codename": "add_order", "name": null, "service": null}]'
+        assert [p.codename for p in storage.get_permissions()] == ['add_order']
+        assert storage.version == version + 1
+    finally:
+        storage.close()
+
+
+def test_http_storage_failover(catalog_server, unused_url):
+    url = f'http://127.0.0.1:{catalog_server.server_port}/permissions.json'
+    storage = HttpStorage(ttl=0, permission_urls=[unused_url, url])
+    try:
+        assert storage.get_permissions()
+        assert storage.permission_urls[storage._target_idx] == url
+    finally:
+        storage.close()
+
+    storage = HttpStorage(ttl=60, permission_urls=[url])
+    catalog_server.shutdown()
+    catalog_server.server_close()
+    storage._snapshot = dataclasses.replace(storage.snapshot, expires_in=datetime.min)
+    # the previous catalog is kept when every target is down
+    assert storage.get_permissions()
+    storage.close()
+
+    with pytest.raises(OSError):
+        HttpStorage(ttl=60, permission_urls=[unused_url])
+
+
+def test_http_storage_failover_etag(catalog_server):
+    # Both targets serve the same body, so they'd tag it with the same ETag
+    secondary_server = _start_catalog_server()
+    url = f'http://127.0.0.1:{catalog_server.server_port}/permissions.json'
+    secondary_url = f'http://127.0.0.1:{secondary_server.server_port}/permissions.json'
+    storage = HttpStorage(ttl=0, permission_urls=[url, secondary_url])
+    try:
+        version = storage.version
+        catalog_server.shutdown()
+        catalog_server.server_close()
+        for connection in storage._connections.values():
+            connection.close()  # the handler of the pooled connection outlives the server
+
+        # The ETag of the primary is never sent to the secondary, which serves the catalog rather than a 304
+        assert storage.get_permissions()
+        assert storage.permission_urls[storage._target_idx] == secondary_url
+        assert storage.version == version
+        assert secondary_server.statuses == [200]
+
+        # The secondary revalidates its own ETag
+        storage.get_permissions()
+        assert secondary_server.statuses == [200, 304]
+    finally:
+        storage.close()
+        secondary_server.shutdown()
+        secondary_server.server_close()
+
+
+def _write_catalog_atomically(file_path: pathlib.Path, codenames: list[str]):
+    temp_path = file_path.with_suffix('.tmp')
+    temp_path.write_text(
+        json.dumps([{'bitmask_idx': i, 'codename': c, 'name': None, 'service': None} for i, c in enumerate(codenames)])
+    )
+    os.replace(temp_path, file_path)
+
+
+def test_json_file_storage_watch(tmp_path):
+    file_path = tmp_path / 'permissions.json'
+    _write_catalog_atomically(file_path, ['add_order'])
+    storage = JsonFileStorage(ttl=0, permission_file_path=str(file_path), watch=True)
+
+    with mock.patch('json.load', side_effect=json.load) as json_load:
+        permission_models = storage.get_permissions()
+        assert storage.get_permissions() is permission_models
+        assert json_load.call_count == 0
+
+        # the replaced file has the same size and maybe the same mtime, but a new inode
+        _write_catalog_atomically(file_path, ['view_order'])
+        assert [p.codename for p in storage.get_permissions()] == ['view_order']
+        assert json_load.call_count == 1
+
+
+@pytest.mark.skipif(not InotifyWatcher.is_supported(), reason='inotify is not supported')
+def test_json_file_storage_inotify(tmp_path):
+    file_path = tmp_path / 'permissions.json'
+    _write_catalog_atomically(file_path, ['add_order'])
+    storage = JsonFileStorage(ttl=3600, permission_file_path=str(file_path), inotify=True)
+    try:
+        _write_catalog_atomically(file_path, ['view_order'])
+        for _ in range(500):
+            if storage.version == 2:
+                break
+            time.sleep(0.01)
+        assert [p.codename for p in storage.get_permissions()] == ['view_order']
+    finally:
+        storage.close()
+
+
+def test_shared_catalog_storage(tmp_path, monkeypatch):
+    file_path, shared_catalog_path = tmp_path / 'permissions.json', str(tmp_path / 'permissions.shm')
+    _write_catalog_atomically(file_path, ['add_order'])
+    publisher = SharedCatalogPublisher(
+        JsonFileStorage(ttl=0, permission_file_path=str(file_path), watch=True), shared_catalog_path, capacity=4096
+    )
+    storage = SharedCatalogStorage(ttl=0, shared_catalog_path=shared_catalog_path)
+    assert [p.codename for p in storage.get_permissions()] == ['add_order']
+
+    # The catalog is reparsed only if the generation is changed
+    permission_models = storage.get_permissions()
+    assert not publisher.publish()
+    assert storage.get_permissions() is permission_models and storage.version == 1
+
+    _write_catalog_atomically(file_path, ['add_order', 'view_order'])
+    assert publisher.publish()
+    assert [p.codename for p in storage.get_permissions()] == ['add_order', 'view_order']
+    assert storage.version == 2
+    # The workers look up the binary catalog rather than parsing it
+    assert isinstance(storage.snapshot.catalog, BinaryCatalog)
+
+    # A write starting while the payload is copied is noticed after the copy, and the payload is copied again
+    generations = []
+
+    def read_generation(shared_mmap):
+        generations.append(SharedCatalogStorage._read_generation(shared_mmap))
+        return generations[-1] + (len(generations) == 2)
+
+    monkeypatch.setattr(storage, '_read_generation', read_generation)
+    _write_catalog_atomically(file_path, ['view_order'])
+    assert publisher.publish()
+    assert [p.codename for p in storage.get_permissions()] == ['view_order']
+    assert len(generations) == 3 and storage.version == 3
+    monkeypatch.undo()
+
+    # Another process reads the same catalog
+    code = (
+        'from web_auth import SharedCatalogStorage; '
+        f'print(*[p.codename for p in SharedCatalogStorage(ttl=0, shared_catalog_path={shared_catalog_path!r})'
+        '.get_permissions()])'
+    )
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, check=True, text=True).stdout
+    assert output.split() == ['view_order']
+
+    storage.close()
+    publisher.close()
+
+
+def test_binary_file_storage(tmp_path):
+    binary_file_path = str(tmp_path / 'permissions.bin')
+    convert_json_to_binary('usr/etc/permissions.json', binary_file_path)
+    json_storage = JsonFileStorage(ttl=0, permission_file_path='usr/etc/permissions.json')
+    storage = BinaryFileStorage(ttl=0, permission_file_path=binary_file_path)
+
+    # Only the models looked up are materialized
+    assert storage.get_permission('view_order') == json_storage.get_permission('view_order')
+    assert len(storage._catalog._models) == 1
+
+    for permission in json_storage.get_permissions():
+        assert storage.get_permission(permission.codename) == permission
+        assert storage.get_permission_by_bitmask_idx(permission.bitmask_idx) == permission
+    assert storage.get_permissions_by_service('order') == json_storage.get_permissions_by_service('order')
+    assert storage.get_permissions({'view_order', 'unknown'}) == json_storage.get_permissions({'view_order', 'unknown'})
+    assert list(storage.get_permissions()) == json_storage.get_permissions()
+    assert storage.get_permission('unknown') is None
+    assert storage.get_permission_by_bitmask_idx(10000) is None
+    assert storage.get_permissions_by_service('unknown') == []
+
+    # An atomically replaced file is remapped
+    _write_catalog_atomically(tmp_path / 'permissions.json', ['add_order'])
+    convert_json_to_binary(str(tmp_path / 'permissions.json'), str(tmp_path / 'permissions.tmp'))
+    os.replace(tmp_path / 'permissions.tmp', binary_file_path)
+    assert [p.codename for p in storage.get_permissions()] == ['add_order']
+    assert storage.version == 2
+
+
+@pytest.mark.parametrize('storage_class', [JsonFileStorage, BinaryFileStorage])
+def test_storage_services(tmp_path, storage_class):
+    file_path = 'usr/etc/permissions.json'
+    if storage_class is BinaryFileStorage:
+        file_path = str(tmp_path / 'permissions.bin')
+        convert_json_to_binary('usr/etc/permissions.json', file_path)
+    json_storage = JsonFileStorage(ttl=0, permission_file_path='usr/etc/permissions.json')
+    storage = storage_class(ttl=0, permission_file_path=file_path, services=['order', 'payment'])
+
+    expected = [p for p in json_storage.get_permissions() if p.service in ('order', 'payment')]
+    assert list(storage.get_permissions()) == expected
+    assert storage.get_permission('view_order') == json_storage.get_permission('view_order')
+    assert storage.get_permissions_by_service('payment') == json_storage.get_permissions_by_service('payment')
+
+    # The permissions of the other services are unknown
+    identity_permission = json_storage.get_permissions_by_service('identity')[0]
+    assert storage.get_permission(identity_permission.codename) is None
+    assert storage.get_permission_by_bitmask_idx(identity_permission.bitmask_idx) is None
+    assert storage.get_permissions_by_service('identity') == []
+
+
+def test_role_catalog_storage(tmp_path):
+    file_path, shared_catalog_path = tmp_path / 'permissions.json', str(tmp_path / 'permissions.shm')
+    file_path.write_text(
+        json.dumps(
+            [
+                {'bitmask_idx': 0, 'codename': 'view_order', 'name': 'Can view order', 'service': 'order'},
+                {
+                    'bitmask_idx': 1,
+                    'codename': 'order_viewer',
+                    'name': 'Order viewer',
+                    'service': 'order',
+                    'implies': ['view_order'],
+                },
+            ]
+        )
+    )
+    json_storage = JsonFileStorage(ttl=0, permission_file_path=str(file_path))
+    binary_file_path = str(tmp_path / 'permissions.bin')
+    convert_json_to_binary(str(file_path), binary_file_path)
+    publisher = SharedCatalogPublisher(json_storage, shared_catalog_path, capacity=4096)
+    for storage in (
+        SharedCatalogStorage(ttl=0, shared_catalog_path=shared_catalog_path),
+        BinaryFileStorage(ttl=0, permission_file_path=binary_file_path),
+    ):
+        assert list(storage.get_permissions()) == json_storage.get_permissions()
+        assert storage.snapshot.catalog.role_masks == {1: 0b11}
+        assert storage.snapshot.expand_roles(0b10) == 0b11
+        storage.close()
+    publisher.close()
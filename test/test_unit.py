@@ -1,15 +1,43 @@
+import contextlib
+import dataclasses
+import json
+import logging
 import pathlib
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
 
+import jwt
 import pytest
 
 from web_auth import (
     AuthException,
     BitmaskAuthorization,
+    BitmaskEncodingEnum,
     Config,
+    Consumer,
+    Context,
+    ErrorCode,
     JsonFileStorage,
+    JWTUser,
+    LogTracer,
     PermissionAggregationTypeEnum,
+    PermissionBatch,
+    PermissionModel,
+    RequiredPermissions,
+    Storage,
+    StorageRefreshModeEnum,
+    Tracer,
     WebBridge,
 )
+from web_auth.core.cache import TTLCache
+from web_auth.core.encoding import decode_permission_bitmask, encode_permission_bitmask
+
+IMPORT_TIME_BUDGET_US = 25000
 
 
 def test_access_control(fake_web_bridge):
@@ -38,7 +66,7 @@ def test_bitmask_decoding():
     assert permission_bitmask == BitmaskAuthorization.convert_base64encoded_to_bitmask(base64encoded_bitmask)
 
     base64encoded_bitmask = '//39/'
-    with pytest.raises(AuthException, match=f'Bad base64-encoded `{base64encoded_bitmask}`'):
+    with pytest.raises(AuthException, match='Bad base64-encoded permission bitmask'):
         BitmaskAuthorization.convert_base64encoded_to_bitmask(base64encoded_bitmask)
 
 
@@ -62,3 +90,580 @@ def test_check_bitmask_permissions(fake_web_bridge):
             permission_models=context.storage.get_permissions(),
             aggregation_type=PermissionAggregationTypeEnum.ALL,
         )
+
+
+def test_bitmask_int_decoding():
+    permission_bitmask = '111111111111111111111111111111110111111101111111'
+    base64encoded_bitmask = '/////39/'
+
+    assert (int(permission_bitmask, 2), 48) == BitmaskAuthorization.convert_base64encoded_to_int(base64encoded_bitmask)
+
+    base64encoded_bitmask = '//39/'
+    with pytest.raises(AuthException, match='Bad base64-encoded permission bitmask'):
+        BitmaskAuthorization.convert_base64encoded_to_int(base64encoded_bitmask)
+
+
+@pytest.mark.parametrize(
+    'permissions, aggregation_type, error_code',
+    [
+        ({'view_order'}, PermissionAggregationTypeEnum.ALL, None),
+        ({'view_order', 'delete_tickettype'}, PermissionAggregationTypeEnum.ALL, ErrorCode.PERMISSION_DENIED),
+        ({'view_order', 'delete_tickettype'}, PermissionAggregationTypeEnum.ANY, None),
+        ({'delete_tickettype'}, PermissionAggregationTypeEnum.ANY, ErrorCode.PERMISSION_DENIED),
+        ({'unknown_permission'}, PermissionAggregationTypeEnum.ALL, ErrorCode.BAD_BITMASK),
+        (set(), PermissionAggregationTypeEnum.ANY, None),
+    ],
+)
+def test_check_bitmask_engines(fake_web_bridge, permissions, aggregation_type, error_code):
+    context = Config.make_context(
+        bridge_class=fake_web_bridge, storage_class=JsonFileStorage, storage_params=Config.DEFAULT_STORAGE_PARAMS
+    )
+    permission_models = context.storage.get_permissions()
+    base64encoded_bitmask = '/////39/'
+
+    def check_by_string():
+        BitmaskAuthorization.check_permissions(
+            permissions=permissions,
+            aggregation_type=aggregation_type,
+            permission_bitmask=BitmaskAuthorization.convert_base64encoded_to_bitmask(base64encoded_bitmask),
+            permission_models=permission_models,
+        )
+
+    def check_by_int():
+        BitmaskAuthorization.check_permission_mask(
+            BitmaskAuthorization.make_permission_mask(permissions, permission_models),
+            aggregation_type,
+            *BitmaskAuthorization.convert_base64encoded_to_int(base64encoded_bitmask),
+        )
+
+    for check in (check_by_string, check_by_int):
+        if error_code is None:
+            check()
+        else:
+            with pytest.raises(AuthException) as exc_info:
+                check()
+            assert exc_info.value.code == error_code
+
+
+def test_authorize_many(fake_web_bridge, monkeypatch):
+    context = Config.make_context(
+        bridge_class=fake_web_bridge, storage_class=JsonFileStorage, storage_params=Config.DEFAULT_STORAGE_PARAMS
+    )
+    authorization = BitmaskAuthorization(context)
+    consumer = Consumer(permission_bitmask='/////39/', user=None)
+    requirements = [
+        ('view_order', PermissionAggregationTypeEnum.ALL),
+        ({'view_order', 'delete_tickettype'}, PermissionAggregationTypeEnum.ALL),
+        ({'view_order', 'delete_tickettype'}, PermissionAggregationTypeEnum.ANY),
+        ({'delete_tickettype'}, PermissionAggregationTypeEnum.ANY),
+        ({'unknown_permission'}, PermissionAggregationTypeEnum.ALL),
+        (set(), PermissionAggregationTypeEnum.ANY),
+    ]
+    expected = [True, False, True, False, False, True]
+    assert authorization.authorize_many(consumer, requirements) == expected
+
+    # The NumPy evaluation agrees with the integer one
+    pytest.importorskip('numpy')
+    monkeypatch.setattr(PermissionBatch, 'NUMPY_MIN_SIZE', 0)
+    batch = PermissionBatch(requirements * 20)
+    assert authorization.authorize_many(consumer, batch) == expected * 20
+    assert batch.compiled[2] is not None
+    assert (
+        authorization.authorize_many(Consumer(permission_bitmask='AAA=', user=None), batch)
+        == [
+            False,
+            False,
+            False,
+            False,
+            False,
+            True,
+        ]
+        * 20
+    )
+
+    with pytest.raises(AuthException) as exc_info:
+        authorization.authorize_many(Consumer(permission_bitmask='abc', user=None), batch)
+    assert exc_info.value.code == ErrorCode.BAD_BASE64_ENCODED
+
+
+def test_effective_permissions(fake_web_bridge):
+    context = Config.make_context(
+        bridge_class=fake_web_bridge,
+        storage_class=JsonFileStorage,
+        storage_params=Config.DEFAULT_STORAGE_PARAMS,
+        effective_permissions_cache_params={'maxsize': 256, 'ttl': 3600},
+    )
+    authorization = BitmaskAuthorization(context)
+    cache = context.bridge.effective_permissions_cache
+    consumer = Consumer(permission_bitmask='/////39/', user=None)
+    # `/////39/` grants every bit but 7 and 15
+    expected = frozenset(p.codename for p in context.storage.get_permissions() if p.bitmask_idx not in (7, 15))
+    assert authorization.get_effective_permissions(consumer) == expected
+    assert cache.misses == 1
+
+    # The granted codenames are looked up by the first read, rather than by the authorization
+    consumer = Consumer(permission_bitmask='////////', user=None)
+    authorization.authorize(consumer, {'view_order'}, PermissionAggregationTypeEnum.ALL)
+    assert len(cache) == 1
+    assert consumer.effective_permissions == frozenset(p.codename for p in context.storage.get_permissions())
+    assert len(cache) == 2
+
+    # A consumer of the same bitmask short-circuits on the cached set
+    consumer = Consumer(permission_bitmask='/////39/', user=None)
+    authorization.authorize(consumer, RequiredPermissions({'view_order'}), PermissionAggregationTypeEnum.ALL)
+    assert consumer.effective_permissions is cache.get(('/////39/', context.storage.version))
+    assert cache.hits == 2
+
+    # Denials still raise their own error codes
+    for permissions, aggregation_type, error_code in [
+        ({'view_order', 'delete_tickettype'}, PermissionAggregationTypeEnum.ALL, ErrorCode.PERMISSION_DENIED),
+        ({'delete_tickettype'}, PermissionAggregationTypeEnum.ANY, ErrorCode.PERMISSION_DENIED),
+        ({'unknown_permission'}, PermissionAggregationTypeEnum.ANY, ErrorCode.BAD_BITMASK),
+    ]:
+        with pytest.raises(AuthException) as exc_info:
+            authorization.authorize(consumer, permissions, aggregation_type)
+        assert exc_info.value.code == error_code
+
+    assert Config.make_context(bridge_class=fake_web_bridge).bridge.effective_permissions_cache is None
+
+
+def test_effective_permissions_of_huge_bitmask(fake_web_bridge):
+    context = Config.make_context(
+        bridge_class=fake_web_bridge, storage_class=JsonFileStorage, storage_params=Config.DEFAULT_STORAGE_PARAMS
+    )
+    authorization = BitmaskAuthorization(context)
+    # A forged claim of a few characters granting every bit of the longest bitmask, i.e. a run of 2 ** 20 granted bits
+    consumer = Consumer(permission_bitmask='r1:gIBAAICAQA')
+    assert BitmaskAuthorization.convert_base64encoded_to_int(consumer.permission_bitmask)[1] == 1 << 20
+    # ...which is decoded only up to the catalog
+    bitmask_len = context.storage.snapshot.catalog.bitmask_len
+    assert authorization.get_granted_bitmask(consumer.permission_bitmask) == ((1 << bitmask_len) - 1, bitmask_len)
+
+    started_at = time.perf_counter()
+    authorization.authorize(consumer, {'view_order'}, PermissionAggregationTypeEnum.ALL)
+    assert consumer.effective_permissions == frozenset(p.codename for p in context.storage.get_permissions())
+    assert time.perf_counter() - started_at < 0.1
+
+
+def test_required_permissions_mask_follows_storage_version(fake_web_bridge):
+    class MemoryStorage(Storage):
+        permission_models = [PermissionModel(bitmask_idx=3, codename='view_order', name=None, service=None)]
+
+        def _load_permissions(self) -> list[PermissionModel]:
+            return list(self.permission_models)
+
+    context = Config.make_context(bridge_class=fake_web_bridge, storage_class=MemoryStorage, storage_params={'ttl': 0})
+    authorization = BitmaskAuthorization(context)
+    permissions = RequiredPermissions({'view_order'}, PermissionAggregationTypeEnum.ALL)
+
+    assert authorization.get_permission_mask(permissions) == 0b1000
+    assert permissions.compiled_mask == (context.storage.version, 0b1000)
+
+    # an unchanged reload keeps the compiled mask
+    version = context.storage.version
+    context.storage.get_permissions()
+    assert context.storage.version == version
+
+    MemoryStorage.permission_models = [PermissionModel(bitmask_idx=5, codename='view_order', name=None, service=None)]
+    context.storage.get_permissions()
+    assert authorization.get_permission_mask(permissions) == 0b100000
+    assert permissions.compiled_mask == (version + 1, 0b100000)
+
+
+def test_ttl_cache():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1  # `b` becomes the least recently used
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert (cache.hits, cache.misses, len(cache)) == (1, 1, 2)
+
+    cache.set('expired', 4, expires_at=time.time() - 1)
+    assert cache.get('expired') is None
+
+
+def test_consumer_cache(fake_web_bridge, jwt_token, jwt_payload):
+    context = Config.make_context(bridge_class=fake_web_bridge, consumer_cache_params={'maxsize': 8, 'ttl': 60})
+    consumer_cache = context.bridge.consumer_cache
+    token = jwt.encode({**jwt_payload, 'exp': int(time.time()) + 60}, 'secret' * 8)
+
+    consumer = context.bridge.authenticate_jwt_token(token)
+    consumer.effective_permissions = frozenset({'view_order'})
+    # every request gets its own consumer of the cached payload, so the state of one is never seen by another
+    cached_consumer = context.bridge.authenticate_jwt_token(token)
+    assert cached_consumer is not consumer and cached_consumer.effective_permissions is None
+    assert cached_consumer.user == consumer.user and cached_consumer.credential == token
+    assert (consumer_cache.hits, consumer_cache.misses) == (1, 1)
+
+    # the token of `jwt_token` is expired, so it's never cached
+    context.bridge.authenticate_jwt_token(jwt_token)
+    context.bridge.authenticate_jwt_token(jwt_token)
+    assert len(consumer_cache) == 1
+
+    assert Config.make_context(bridge_class=fake_web_bridge).bridge.consumer_cache is None
+
+
+def test_rejected_token_cache(fake_web_bridge, jwt_payload, monkeypatch):
+    context = Config.make_context(bridge_class=fake_web_bridge, rejected_token_cache_params={'maxsize': 2, 'ttl': 60})
+    bridge = context.bridge
+    decoded_tokens = []
+    decode_jwt_token = bridge.decode_jwt_token
+    monkeypatch.setattr(
+        bridge, 'decode_jwt_token', lambda token: decoded_tokens.append(token) or decode_jwt_token(token)
+    )
+
+    for _ in range(3):
+        with pytest.raises(AuthException, match='^Bad token$') as exc_info:
+            bridge.authenticate_jwt_token('garbage')
+        assert exc_info.value.code == ErrorCode.BAD_JWT
+    assert decoded_tokens == ['garbage']
+
+    # the valid tokens are never remembered
+    token = jwt.encode({**jwt_payload, 'exp': int(time.time()) + 60}, 'secret' * 8)
+    bridge.authenticate_jwt_token(token)
+    bridge.authenticate_jwt_token(token)
+    assert len(bridge.rejected_token_cache) == 1
+
+    disabled_context = Config.make_context(bridge_class=fake_web_bridge, rejected_token_cache_params={'maxsize': 0})
+    with pytest.raises(AuthException):
+        disabled_context.bridge.authenticate_jwt_token('garbage')
+    assert len(disabled_context.bridge.rejected_token_cache) == 0
+
+
+def test_consumer_builds_user_lazily(monkeypatch, jwt_payload):
+    built = []
+    monkeypatch.setattr(
+        Consumer, 'user_class', staticmethod(lambda **payload: built.append(payload) or JWTUser(**payload))
+    )
+
+    consumer = Consumer(permission_bitmask='/////39/', auth_scheme='JWT', user_payload=jwt_payload)
+    assert not hasattr(consumer, '__dict__')
+    assert not built
+    assert consumer.user.user_id == jwt_payload['user_id'] and consumer.user is consumer.user
+    assert len(built) == 1
+
+    # Subclasses keep working with their own attributes, and an explicit user is never rebuilt
+    class AccountConsumer(Consumer):
+        def __init__(self, account: str, **kwargs):
+            super().__init__(**kwargs)
+            self.account = account
+
+    consumer = AccountConsumer(account='52354342/Jack', permission_bitmask='/////39/', user='Jack')
+    assert consumer.account == '52354342/Jack' and consumer.user == 'Jack'
+    consumer.user = 'Tom'
+    assert consumer.user == 'Tom'
+    assert len(built) == 1
+
+
+def test_access_control_tracing(fake_web_bridge, caplog):
+    class RecordingTracer(Tracer):
+        def __init__(self):
+            self.spans = []
+
+        @contextlib.contextmanager
+        def start_as_current_span(self, name: str):
+            self.spans.append(name)
+            yield
+
+    tracer = RecordingTracer()
+    context = Config.make_context(
+        bridge_class=fake_web_bridge,
+        storage_class=JsonFileStorage,
+        storage_params=Config.DEFAULT_STORAGE_PARAMS,
+        tracer=tracer,
+    )
+    context.bridge.access_control(pathlib.Path('usr/etc/JWT.txt'), {'view_order'}, PermissionAggregationTypeEnum.ALL)
+    assert tracer.spans == [
+        'web_auth.access_control',
+        'web_auth.authenticate',
+        'web_auth.storage_lookup',
+        'web_auth.bitmask_check',
+    ]
+    context.bridge.authenticate_jwt_token(pathlib.Path('usr/etc/JWT.txt').read_text(encoding='utf8').strip())
+    assert tracer.spans[-1] == 'web_auth.jwt_decode'
+
+    context.tracer = LogTracer(logging.getLogger('web_auth.tracing'))
+    context.bridge = fake_web_bridge(context)
+    with caplog.at_level(logging.INFO, logger='web_auth.tracing'):
+        with pytest.raises(AuthException):
+            context.bridge.access_control(
+                pathlib.Path('usr/etc/JWT.txt'), {'delete_tickettype'}, PermissionAggregationTypeEnum.ALL
+            )
+    assert [r.args[0] for r in caplog.records][-1] == 'web_auth.access_control'
+
+    assert Tracer.__abstractmethods__ == frozenset({'start_as_current_span'})  # an abstract interface
+
+
+def test_storage_refresh_failure_keeps_previous_catalog(caplog):
+    class FlakyStorage(Storage):
+        loaded_times = 0
+
+        def _load_permissions(self) -> list[PermissionModel]:
+            self.loaded_times += 1
+            if self.loaded_times > 1:
+                raise OSError('catalog unavailable')
+            return [PermissionModel(bitmask_idx=0, codename='add_order', name=None, service=None)]
+
+    storage = FlakyStorage(ttl=0)
+    with caplog.at_level(logging.ERROR):
+        assert [p.codename for p in storage.get_permissions()] == ['add_order']
+    assert storage.loaded_times == 2
+    assert 'Failed to refresh permission cache' in caplog.text
+
+
+def test_storage_background_refresh():
+    class MemoryStorage(Storage):
+        permission_models = [PermissionModel(bitmask_idx=0, codename='add_order', name=None, service=None)]
+        loaded_times = 0
+
+        def _load_permissions(self) -> list[PermissionModel]:
+            self.loaded_times += 1
+            return list(self.permission_models)
+
+    # requests never reload the catalog, even if it's expired
+    storage = MemoryStorage(ttl=60, refresh_mode=StorageRefreshModeEnum.BACKGROUND)
+    storage._snapshot = dataclasses.replace(storage.snapshot, expires_in=datetime.utcnow() - timedelta(seconds=1))
+    storage.get_permissions()
+    assert storage.loaded_times == 1
+    storage.close()
+
+    storage = MemoryStorage(ttl=0.05, refresh_mode=StorageRefreshModeEnum.BACKGROUND)
+    try:
+        MemoryStorage.permission_models = [
+            PermissionModel(bitmask_idx=1, codename='view_order', name=None, service=None)
+        ]
+        for _ in range(500):
+            if storage.version == 2:
+                break
+            time.sleep(0.01)
+        assert [p.codename for p in storage.get_permissions()] == ['view_order']
+    finally:
+        storage.close()
+
+
+def test_storage_background_first_load_failure(caplog):
+    class FlakyStorage(Storage):
+        failures = 2
+        loaded_times = 0
+
+        def _load_permissions(self) -> list[PermissionModel]:
+            self.loaded_times += 1
+            if self.loaded_times <= self.failures:
+                raise OSError('unavailable')
+            return [PermissionModel(bitmask_idx=0, codename='add_order', name=None, service=None)]
+
+    # the refresh thread survives the failed first loads of a lazy storage and retries at the next ticks
+    storage = FlakyStorage(ttl=0.05, refresh_mode=StorageRefreshModeEnum.BACKGROUND, lazy=True)
+    try:
+        for _ in range(500):
+            if storage.loaded:
+                break
+            time.sleep(0.01)
+        assert [p.codename for p in storage.get_permissions()] == ['add_order']
+        assert storage.loaded_times > FlakyStorage.failures
+    finally:
+        storage.close()
+    assert 'Failed to load permission cache' in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_async_access_control(fake_web_bridge):
+    class ThreadRecordingStorage(JsonFileStorage):
+        loader_threads = []
+
+        def _load_permissions(self) -> list[PermissionModel]:
+            self.loader_threads.append(threading.current_thread())
+            return super()._load_permissions()
+
+    context = Config.make_context(
+        bridge_class=fake_web_bridge,
+        storage_class=ThreadRecordingStorage,
+        storage_params={**Config.DEFAULT_STORAGE_PARAMS, 'ttl': 0},
+    )
+    ThreadRecordingStorage.loader_threads.clear()
+
+    reqeust = pathlib.Path('usr/etc/JWT.txt')
+    await context.bridge.aaccess_control(reqeust, permissions={'view_order'})
+    with pytest.raises(AuthException, match='Permission denied'):
+        await context.bridge.aaccess_control(reqeust, permissions={'delete_tickettype'})
+
+    assert ThreadRecordingStorage.loader_threads
+    assert threading.main_thread() not in ThreadRecordingStorage.loader_threads
+
+
+def test_storage_indexes():
+    storage = JsonFileStorage(**Config.DEFAULT_STORAGE_PARAMS)
+
+    assert storage.get_permission('view_order').bitmask_idx == 3
+    assert storage.get_permission('unknown_permission') is None
+    assert storage.get_permission_by_bitmask_idx(3).codename == 'view_order'
+    assert storage.get_permission_by_bitmask_idx(-1) is None
+    assert {p.codename for p in storage.get_permissions_by_service('order')} >= {'add_order', 'view_order'}
+    assert storage.get_permissions_by_service('unknown_service') == []
+    assert {p.codename for p in storage.get_permissions({'view_order', 'unknown_permission'})} == {'view_order'}
+
+
+def test_decoration_shares_required_permissions(fake_web_bridge):
+    context = Config.make_context(bridge_class=fake_web_bridge)
+
+    assert context._get_required_permissions(['view_order', 'add_order'], PermissionAggregationTypeEnum.ALL) is (
+        context._get_required_permissions(('add_order', 'view_order'), PermissionAggregationTypeEnum.ALL)
+    )
+    assert context._get_required_permissions('view_order', PermissionAggregationTypeEnum.ALL) is not (
+        context._get_required_permissions('view_order', PermissionAggregationTypeEnum.ANY)
+    )
+
+    class CustomContext(Context):
+        def __init__(self):  # pylint: disable=super-init-not-called
+            self.tenant = 'acme'
+
+    context = Config.make_context(bridge_class=fake_web_bridge, context_class=CustomContext)
+    assert context.permissions('view_order') is not None
+    assert context._get_required_permissions(['view_order'], PermissionAggregationTypeEnum.ALL) is (
+        context._get_required_permissions(('view_order',), PermissionAggregationTypeEnum.ALL)
+    )
+
+    def view(item_id: Optional[int], consumer: Consumer) -> dict:
+        pass
+
+    assert context.bridge.get_consumer_parameter_name(view) == 'consumer'
+    assert context.bridge.get_consumer_parameter_name(lambda request: None) is None
+
+
+def test_import_time():
+    """`import web_auth` imports neither the dependencies nor the storages, which are imported on first access."""
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import web_auth'], capture_output=True, check=True, text=True
+    ).stderr
+    cumulative_us = {}
+    for line in output.splitlines()[1:]:  # skip the header
+        _, cumulative, name = line.split('|')
+        cumulative_us[name.strip()] = int(cumulative)
+
+    assert not {'jwt', 'pydantic', 'web_auth.config', 'web_auth.core.storage'} & set(cumulative_us)
+    assert cumulative_us['web_auth'] < IMPORT_TIME_BUDGET_US
+
+
+def test_lazy_storage(fake_web_bridge):
+    storage_params = {**Config.DEFAULT_STORAGE_PARAMS, 'lazy': True}
+    context = Config.make_context(bridge_class=fake_web_bridge, storage_params=storage_params)
+    assert not context.storage.loaded
+
+    # decorating a view doesn't load the catalog, the first request does
+    context._get_required_permissions('view_order', PermissionAggregationTypeEnum.ALL)
+    assert not context.storage.loaded
+    context.bridge.access_control(pathlib.Path('usr/etc/JWT.txt'), permissions={'view_order'})
+    assert context.storage.loaded and context.storage.version == 1
+
+
+def test_bitmask_encodings(fake_web_bridge):
+    context = Config.make_context(
+        bridge_class=fake_web_bridge, storage_class=JsonFileStorage, storage_params=Config.DEFAULT_STORAGE_PARAMS
+    )
+    authorization = BitmaskAuthorization(context)
+    # the grants of `/////39/`, every bit of 48 but 7 and 15
+    granted_idx = [i for i in range(48) if i not in (7, 15)]
+    dense = BitmaskAuthorization.convert_base64encoded_to_int('/////39/')
+    for encoding in BitmaskEncodingEnum:
+        permission_bitmask = encode_permission_bitmask(granted_idx, 48, encoding)
+        assert BitmaskAuthorization.convert_base64encoded_to_int(permission_bitmask) == dense
+        assert BitmaskAuthorization.convert_base64encoded_to_bitmask(permission_bitmask) == format(dense[0], '048b')
+
+        consumer = Consumer(permission_bitmask=permission_bitmask)
+        authorization.authorize(consumer, {'view_order'}, PermissionAggregationTypeEnum.ALL)
+        with pytest.raises(AuthException, match='Permission denied'):
+            authorization.authorize(consumer, {'delete_tickettype'}, PermissionAggregationTypeEnum.ALL)
+
+    assert encode_permission_bitmask([0, 6000], 6001).startswith('s1:')
+    assert encode_permission_bitmask(range(100, 5000), 6000).startswith('r1:')
+    assert encode_permission_bitmask([], 0, BitmaskEncodingEnum.SPARSE) == 's1:AA'
+    assert BitmaskAuthorization.convert_base64encoded_to_int('s1:AA') == (0, 0)
+    # The bits beyond `max_bitmask_len` are dropped, whether sparse or in a run crossing it
+    sparse = encode_permission_bitmask([1, 9, 70], 100, BitmaskEncodingEnum.SPARSE)
+    assert decode_permission_bitmask(sparse, 10) == (0b1000000010, 10)
+    run_length = encode_permission_bitmask(range(3, 90), 100, BitmaskEncodingEnum.RUN_LENGTH)
+    assert decode_permission_bitmask(run_length, 21) == (0x1FFFF8, 21)
+    # The shortest claim is weighed by its decoding cost, so many scattered grants stay dense
+    assert ':' not in encode_permission_bitmask(random.Random(0).sample(range(6000), 200), 6000)
+
+    for permission_bitmask, error_code in (
+        ('x1:AA', ErrorCode.BAD_BITMASK),  # an unknown encoding
+        ('s1:!', ErrorCode.BAD_BASE64_ENCODED),
+        ('s1:gA', ErrorCode.BAD_BASE64_ENCODED),  # a truncated varint
+        ('s1:AQE', ErrorCode.BAD_BITMASK),  # bit 1 of a 1-bit bitmask
+        ('r1:gICAgIAQ', ErrorCode.BAD_BITMASK),  # a bitmask too long to allocate
+        ('r1:' + 'gICA' * 4 + 'AQ', ErrorCode.BAD_BASE64_ENCODED),  # a varint too long to decode
+        (None, ErrorCode.BAD_BASE64_ENCODED),
+        (123, ErrorCode.BAD_BASE64_ENCODED),
+    ):
+        with pytest.raises(AuthException) as exc_info:
+            BitmaskAuthorization.convert_base64encoded_to_int(permission_bitmask)
+        assert exc_info.value.code == error_code
+        with pytest.raises(AuthException) as exc_info:
+            authorization.authorize(
+                Consumer(permission_bitmask=permission_bitmask), {'view_order'}, PermissionAggregationTypeEnum.ALL
+            )
+        assert exc_info.value.code == error_code
+
+
+def test_role_bundles(fake_web_bridge, tmp_path):
+    with open('usr/etc/permissions.json', encoding='utf8') as fp:
+        permissions = json.load(fp)
+    bitmask_len = len(permissions) + 3
+    permissions += [
+        {
+            'bitmask_idx': bitmask_len - 3,
+            'codename': 'manage_order',
+            'name': 'Can manage order',
+            'service': 'order',
+            'implies': ['add_order', 'change_order', 'delete_order', 'view_order', 'unknown'],
+        },
+        # `order_admin` and `order_auditor` imply each other
+        {
+            'bitmask_idx': bitmask_len - 2,
+            'codename': 'order_admin',
+            'name': 'Order admin',
+            'service': 'order',
+            'implies': ['manage_order', 'order_auditor'],
+        },
+        {
+            'bitmask_idx': bitmask_len - 1,
+            'codename': 'order_auditor',
+            'name': 'Order auditor',
+            'service': 'order',
+            'implies': ['order_admin'],
+        },
+    ]
+    permission_file_path = tmp_path / 'permissions.json'
+    permission_file_path.write_text(json.dumps(permissions))
+    context = Config.make_context(
+        bridge_class=fake_web_bridge,
+        storage_class=JsonFileStorage,
+        storage_params={'ttl': 0, 'permission_file_path': str(permission_file_path)},
+    )
+    authorization = BitmaskAuthorization(context)
+    order_codenames = {'add_order', 'change_order', 'delete_order', 'view_order', 'manage_order'}
+    catalog = context.storage.snapshot.catalog
+    role_masks = {catalog.bitmask_idx_index[idx].codename: mask for idx, mask in catalog.role_masks.items()}
+    assert {
+        p.codename for p in context.storage.get_permissions() if role_masks['manage_order'] >> p.bitmask_idx & 1
+    } == order_codenames
+    assert (
+        role_masks['order_admin']
+        == role_masks['order_auditor']
+        == role_masks['manage_order'] | 0b11 << (bitmask_len - 2)
+    )
+
+    consumer = Consumer(permission_bitmask=encode_permission_bitmask([bitmask_len - 1], bitmask_len))
+    authorization.authorize(consumer, {'delete_order', 'order_admin'}, PermissionAggregationTypeEnum.ALL)
+    with pytest.raises(AuthException, match='Permission denied'):
+        authorization.authorize(consumer, {'view_paymentrecord'}, PermissionAggregationTypeEnum.ALL)
+    assert authorization.get_effective_permissions(consumer) == order_codenames | {'order_admin', 'order_auditor'}
+    assert authorization.authorize_many(
+        consumer,
+        [
+            ({'view_order'}, PermissionAggregationTypeEnum.ALL),
+            ({'view_paymentrecord'}, PermissionAggregationTypeEnum.ALL),
+        ],
+    ) == [True, False]
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+import pytest
+from jwt.algorithms import get_default_algorithms
+
+from web_auth import AuthException, Config, ErrorCode, JWTVerifier
+
+ec = pytest.importorskip('cryptography.hazmat.primitives.asymmetric.ec')
+rsa = pytest.importorskip('cryptography.hazmat.primitives.asymmetric.rsa')
+
+HS_KEY = 'a-shared-secret-of-at-least-32-bytes'
+
+
+def _make_payload(**kwargs) -> dict:
+    utc_now = int(time.time())
+    return {'user_id': 1, 'permission_bitmask': '/////39/', 'iat': utc_now, 'exp': utc_now + 60, **kwargs}
+
+
+def _make_jwk(private_key, kid: str, alg: str) -> dict:
+    algorithm = get_default_algorithms()[alg]
+    return {**json.loads(algorithm.to_jwk(private_key.public_key())), 'kid': kid, 'alg': alg, 'use': 'sig'}
+
+
+class _JWKSHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests += 1
+        body = json.dumps({'keys': self.server.jwks}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def jwks_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _JWKSHandler)
+    server.jwks = []
+    server.requests = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_verify_hs_token(fake_web_bridge):
+    context = Config.make_context(bridge_class=fake_web_bridge, jwt_params={'algorithms': ['HS256'], 'key': HS_KEY})
+    token = jwt.encode(_make_payload(), HS_KEY, algorithm='HS256')
+
+    assert context.bridge.authenticate_jwt_token(token).user.user_id == 1
+    context.bridge.authenticate_jwt_token(token)
+    assert context.bridge.jwt_verifier.cache.hits == 1
+
+    for bad_token in (
+        jwt.encode(_make_payload(), 'another-secret-of-at-least-32-bytes', algorithm='HS256'),
+        jwt.encode(_make_payload(exp=int(time.time()) - 10), HS_KEY, algorithm='HS256'),
+        token[:-2],
+    ):
+        with pytest.raises(AuthException) as exc_info:
+            context.bridge.authenticate_jwt_token(bad_token)
+        assert exc_info.value.code == ErrorCode.BAD_JWT
+
+
+def test_verify_jwks_key_rotation(jwks_server):
+    rsa_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    ec_key = ec.generate_private_key(ec.SECP256R1())
+    jwks_server.jwks = [_make_jwk(rsa_key, 'rsa-1', 'RS256')]
+    verifier = JWTVerifier(
+        algorithms=['RS256', 'ES256'],
+        jwks_url=f'http://127.0.0.1:{jwks_server.server_port}/.well-known/jwks.json',
+        jwks_min_reload_interval=0,
+    )
+
+    rsa_token = jwt.encode(_make_payload(), rsa_key, algorithm='RS256', headers={'kid': 'rsa-1'})
+    assert verifier.decode(rsa_token)['user_id'] == 1
+    assert jwks_server.requests == 1
+
+    # A token signed by a rotated-in key reloads the JWKS
+    ec_token = jwt.encode(_make_payload(user_id=2), ec_key, algorithm='ES256', headers={'kid': 'ec-1'})
+    with pytest.raises(AuthException, match='unknown key'):
+        verifier.decode(ec_token)
+    jwks_server.jwks.append(_make_jwk(ec_key, 'ec-1', 'ES256'))
+    assert verifier.decode(ec_token)['user_id'] == 2
+
+    # Known keys are neither reloaded nor parsed again
+    requests = jwks_server.requests
+    verifier.cache.clear()
+    assert verifier.decode(rsa_token)['user_id'] == 1
+    assert jwks_server.requests == requests
+
+
+def test_bridge_accepts_rotated_in_key(fake_web_bridge, jwks_server):
+    rsa_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    ec_key = ec.generate_private_key(ec.SECP256R1())
+    jwks_server.jwks = [_make_jwk(rsa_key, 'rsa-1', 'RS256')]
+    context = Config.make_context(
+        bridge_class=fake_web_bridge,
+        jwt_params={
+            'algorithms': ['RS256', 'ES256'],
+            'jwks_url': f'http://127.0.0.1:{jwks_server.server_port}/.well-known/jwks.json',
+            'jwks_min_reload_interval': 0,
+        },
+    )
+    bridge = context.bridge
+
+    # Neither a token signed by a key not published yet, nor a token not valid yet, is rejected for good
+    ec_token = jwt.encode(_make_payload(user_id=2), ec_key, algorithm='ES256', headers={'kid': 'ec-1'})
+    with pytest.raises(AuthException, match='unknown key'):
+        bridge.authenticate_jwt_token(ec_token)
+    immature_token = jwt.encode(
+        _make_payload(nbf=int(time.time()) + 3600), rsa_key, algorithm='RS256', headers={'kid': 'rsa-1'}
+    )
+    with pytest.raises(AuthException):
+        bridge.authenticate_jwt_token(immature_token)
+    assert len(bridge.rejected_token_cache) == 0
+
+    jwks_server.jwks.append(_make_jwk(ec_key, 'ec-1', 'ES256'))
+    assert bridge.authenticate_jwt_token(ec_token).user.user_id == 2
+
+    # A bad signature is
+    forging_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    forged_token = jwt.encode(_make_payload(), forging_key, algorithm='RS256', headers={'kid': 'rsa-1'})
+    for _ in range(2):
+        with pytest.raises(AuthException):
+            bridge.authenticate_jwt_token(forged_token)
+    assert len(bridge.rejected_token_cache) == 1
+
+
+def test_async_bridge_fetches_jwks_off_the_event_loop(fake_web_bridge, jwks_server):
+    rsa_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwks_server.jwks = [_make_jwk(rsa_key, 'rsa-1', 'RS256')]
+
+    class TokenBridge(fake_web_bridge):
+        def authenticate(self, request: str):
+            return self.authenticate_jwt_token(request)
+
+    context = Config.make_context(
+        bridge_class=TokenBridge,
+        jwt_params={
+            'algorithms': ['RS256'],
+            'jwks_url': f'http://127.0.0.1:{jwks_server.server_port}/.well-known/jwks.json',
+            'jwks_min_reload_interval': 0,
+        },
+    )
+    bridge = context.bridge
+    key_source = bridge.jwt_verifier.key_source
+    assert bridge.jwt_verifier.fetches_keys
+
+    loading_threads = []
+    load_jwks = key_source._load_jwks
+    key_source._load_jwks = lambda: loading_threads.append(threading.current_thread()) or load_jwks()
+
+    async def authenticate():
+        # A token of an unknown `kid` fetches the JWKS
+        token = jwt.encode(_make_payload(), rsa_key, algorithm='RS256', headers={'kid': 'rsa-2'})
+        with pytest.raises(AuthException, match='unknown key'):
+            await bridge.aauthenticate_jwt_token(token)
+
+        with pytest.raises(AuthException, match='unknown key'):
+            await bridge.aauthenticate(token)
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(authenticate())
+    assert len(loading_threads) == 2
+    assert loop_thread not in loading_threads
+
+
+def test_verify_jwks_file(tmp_path):
+    rsa_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwks_file_path = tmp_path / 'jwks.json'
+    jwks_file_path.write_text(json.dumps({'keys': [_make_jwk(rsa_key, 'rsa-1', 'RS256')]}))
+    verifier = JWTVerifier(algorithms=['RS256'], jwks_file_path=str(jwks_file_path))
+
+    token = jwt.encode(_make_payload(), rsa_key, algorithm='RS256', headers={'kid': 'rsa-1'})
+    assert verifier.decode(token)['user_id'] == 1
+
+    # The algorithm is pinned, so an HS token signed with the public key is rejected
+    with pytest.raises(AuthException):
+        verifier.decode(jwt.encode(_make_payload(), HS_KEY, algorithm='HS256', headers={'kid': 'rsa-1'}))
+
+    # So is a token whose algorithm doesn't fit the type of the key
+    verifier = JWTVerifier(algorithms=['RS256', 'ES256'], jwks_file_path=str(jwks_file_path))
+    ec_key = ec.generate_private_key(ec.SECP256R1())
+    with pytest.raises(AuthException):
+        verifier.decode(jwt.encode(_make_payload(), ec_key, algorithm='ES256', headers={'kid': 'rsa-1'}))
@@ -1,34 +1,78 @@
-from typing import Iterable, Union
+"""The public names are imported on first access (PEP 562), so `import web_auth` doesn't import PyJWT, pydantic or
+the storages until they're used.
+"""
+from importlib import import_module
+from typing import TYPE_CHECKING, Iterable, Union
 
-from .config import Config
-from .core.authorization import BitmaskAuthorization
-from .core.bridge import WebBridge
-from .core.context import Context
-from .core.enum import ErrorCode, PermissionAggregationTypeEnum
-from .core.exception import AuthException
-from .core.model import Consumer, ErrorMessageModel, JWTUser, PermissionModel
-from .core.storage import JsonFileStorage, Storage
+from .core.enum import BitmaskEncodingEnum, ErrorCode, PermissionAggregationTypeEnum, StorageRefreshModeEnum
+
+if TYPE_CHECKING:
+    from .config import Config
+    from .core.authorization import BitmaskAuthorization, PermissionBatch
+    from .core.bridge import WebBridge
+    from .core.context import Context
+    from .core.exception import AuthException
+    from .core.model import Consumer, ErrorMessageModel, JWTUser, PermissionModel, RequiredPermissions
+    from .core.shared import SharedCatalogPublisher, SharedCatalogStorage
+    from .core.storage import BinaryFileStorage, CatalogSnapshot, HttpStorage, JsonFileStorage, Storage
+    from .core.tracing import LogTracer, Tracer
+    from .core.verification import JWKSKeySource, JWTVerifier
+
+    configure = Config.configure
+    make_context = Config.make_context
 
 __version__ = '1.2.0'
 
+_LAZY_ATTRS = {
+    'Config': '.config',
+    'WebBridge': '.core.bridge',
+    'Context': '.core.context',
+    'AuthException': '.core.exception',
+    'Consumer': '.core.model',
+    'JWTUser': '.core.model',
+    'PermissionModel': '.core.model',
+    'RequiredPermissions': '.core.model',
+    'ErrorMessageModel': '.core.model',
+    'Storage': '.core.storage',
+    'CatalogSnapshot': '.core.storage',
+    'JsonFileStorage': '.core.storage',
+    'BinaryFileStorage': '.core.storage',
+    'HttpStorage': '.core.storage',
+    'SharedCatalogStorage': '.core.shared',
+    'SharedCatalogPublisher': '.core.shared',
+    'BitmaskAuthorization': '.core.authorization',
+    'PermissionBatch': '.core.authorization',
+    'JWTVerifier': '.core.verification',
+    'JWKSKeySource': '.core.verification',
+    'Tracer': '.core.tracing',
+    'LogTracer': '.core.tracing',
+}
+
+__all__ = [
+    *_LAZY_ATTRS,
+    'BitmaskEncodingEnum',
+    'ErrorCode',
+    'PermissionAggregationTypeEnum',
+    'StorageRefreshModeEnum',
+    'configure',
+    'make_context',
+    'permissions',
+]
 
-_ = (
-    Config,
-    WebBridge,
-    Context,
-    AuthException,
-    Consumer,
-    JWTUser,
-    PermissionModel,
-    ErrorMessageModel,
-    ErrorCode,
-    Storage,
-    JsonFileStorage,
-    BitmaskAuthorization,
-)
 
-configure = Config.configure
-make_context = Config.make_context
+def __getattr__(name: str):
+    if name in ('configure', 'make_context'):
+        value = getattr(__getattr__('Config'), name)
+    elif name in _LAZY_ATTRS:
+        value = getattr(import_module(_LAZY_ATTRS[name], __name__), name)
+    else:
+        raise AttributeError(f'module `{__name__}` has no attribute `{name}`')
+    globals()[name] = value  # later lookups don't reach `__getattr__`
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *__all__})
 
 
 def permissions(
@@ -43,5 +87,7 @@ def permissions(
     :return: A callable(view-function decorator)
     """
 
+    from .config import Config
+
     globals_context: Context = Config.get_globals_context() or Config.configure()
     return globals_context(required_permissions, aggregation_type=aggregation_type)  # pylint: disable=not-callable
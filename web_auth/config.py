@@ -5,6 +5,7 @@ from typing import Optional, Type, Union
 from .core.bridge import WebBridge
 from .core.context import Context
 from .core.storage import Storage
+from .core.tracing import Tracer
 
 
 class Config:
@@ -15,6 +16,10 @@ class Config:
         'ttl': 60,
     }
     DEFAULT_BRIDGE_CLASS = 'web_auth.fastapi.FastapiBridge'
+    DEFAULT_CONSUMER_CACHE_PARAMS: Optional[dict[str, any]] = None  # e.g. {'maxsize': 1024, 'ttl': 60}
+    DEFAULT_JWT_PARAMS: Optional[dict[str, any]] = None  # e.g. {'algorithms': ['RS256'], 'jwks_url': '...'}
+    DEFAULT_EFFECTIVE_PERMISSIONS_CACHE_PARAMS: Optional[dict[str, any]] = None
+    DEFAULT_REJECTED_TOKEN_CACHE_PARAMS: Optional[dict[str, any]] = {'maxsize': 4096, 'ttl': 60}
 
     _globals_context: Optional[Context] = None
 
@@ -42,6 +47,11 @@ class Config:
         bridge_class: Union[Type[WebBridge], str] = None,
         storage_class: Union[Type[Storage], str] = None,
         storage_params: dict[str, any] = None,
+        consumer_cache_params: dict[str, any] = None,
+        jwt_params: dict[str, any] = None,
+        effective_permissions_cache_params: dict[str, any] = None,
+        rejected_token_cache_params: dict[str, any] = None,
+        tracer: Optional[Tracer] = None,
         **kwargs,
     ) -> Context:
         """Do global configuration context. Do nothing if it's already existed."""
@@ -53,6 +63,11 @@ class Config:
                 bridge_class=bridge_class,
                 storage_class=storage_class,
                 storage_params=storage_params,
+                consumer_cache_params=consumer_cache_params,
+                jwt_params=jwt_params,
+                effective_permissions_cache_params=effective_permissions_cache_params,
+                rejected_token_cache_params=rejected_token_cache_params,
+                tracer=tracer,
                 **kwargs,
             )
 
@@ -66,6 +81,11 @@ class Config:
         bridge_class: Union[Type[WebBridge], str] = None,  # assumed use `cls.DEFAULT_BRIDGE_CLASS`
         storage_class: Union[Type[Storage], str] = None,  # assumed to use `cls.DEFAULT_STORAGE_CLASS`
         storage_params: dict[str, any] = None,  # assumed to use `cls.DEFAULT_STORAGE_PARAMS`
+        consumer_cache_params: dict[str, any] = None,  # assumed to use `cls.DEFAULT_CONSUMER_CACHE_PARAMS`
+        jwt_params: dict[str, any] = None,  # assumed to use `cls.DEFAULT_JWT_PARAMS`
+        effective_permissions_cache_params: dict[str, any] = None,  # `cls.DEFAULT_EFFECTIVE_PERMISSIONS_CACHE_PARAMS`
+        rejected_token_cache_params: dict[str, any] = None,  # assumed to use `cls.DEFAULT_REJECTED_TOKEN_CACHE_PARAMS`
+        tracer: Optional[Tracer] = None,  # assumed not to trace
         **kwargs,
     ) -> Context:
         """Create a configuration context. For omitted arguments, copy the items of the global context.
@@ -78,9 +98,38 @@ class Config:
         :param storage_class: the storage class to use. It can be either a string representing the path to the storage
             class or the storage class itself.
         :param storage_params: a dict to be passed to the storage class. Its keys can be:
-            - permission_urls: a list of URLs used by a sample-web-lb to select one healthy target to load data.
+            - permission_urls: a list of URLs that `HttpStorage` fails over between to load data from a healthy target.
+            - timeout: `HttpStorage` connection timeout in seconds, default to 5.
             - permission_file_path: the file path where the permissions are stored.
+            - shared_catalog_path: the file that a `SharedCatalogPublisher` publishes to `SharedCatalogStorage`.
+            - watch: `JsonFileStorage` reparses the file only if it's changed, and the `ttl` becomes the poll interval.
+            - inotify: `JsonFileStorage` reloads as soon as the file is changed (Linux only), `ttl` polls as a fallback.
             - ttl: storage cache timeout interval, default to 60 seconds.
+            - services: a service or services whose permissions are loaded and checked, default to all services.
+            - refresh_mode: `inline` (default) reloads in the request finding the cache expired, `background` reloads
+              in a daemon thread ahead of expiry.
+            - lazy: load the catalog on the first lookup rather than on creating the storage, default to False. The
+              required permissions of the views decorated before the first lookup are not validated.
+        :param consumer_cache_params: a dict to enable caching the decoded payloads of JWT tokens by the token, so a
+            consumer is created without decoding a token seen before. Its keys can be:
+            - maxsize: the maximum number of cached payloads, default to 1024.
+            - ttl: cache timeout interval, default to 60 seconds. An entry never outlives the token's `exp`.
+        :param jwt_params: a dict to verify the signature of JWT tokens, which are decoded without verification if it's
+            omitted. Its keys can be:
+            - algorithms: the accepted algorithms, e.g. ['HS256'] or ['RS256', 'ES256'].
+            - key: an HS secret or a PEM-encoded public key. Otherwise, one of the following is required.
+            - jwks_file_path / jwks_url: a JWKS whose keys are looked up by the `kid` header.
+            - jwks_ttl: JWKS cache timeout interval, default to 300 seconds. An unknown `kid` reloads it earlier.
+            - audience, issuer, leeway: the claims to verify.
+            - cache_maxsize, cache_ttl: the bounds of the verified payload cache, default to 1024 and 60 seconds.
+        :param effective_permissions_cache_params: a dict to enable caching the granted codenames of a bitmask per
+            catalog version, which lets authorization skip decoding the bitmask of a consumer seen before. Its keys are
+            `maxsize` and `ttl`, e.g. 256 and 3600 seconds. The cache is disabled by default.
+        :param rejected_token_cache_params: a dict to bound the cache of the error codes of the tokens failing to
+            decode for good, e.g. malformed or badly signed, keyed by their hash, which rejects a replayed bad token
+            without decoding it again. Its keys can be `maxsize` and `ttl`, default to 4096 and 60 seconds. A `maxsize`
+            of 0 disables the cache.
+        :param tracer: a `Tracer`, e.g. an OpenTelemetry tracer, to wrap the access control phases in spans.
         :param kwargs: allows for any extra data to be stored in the context.
         :return: a new context instance.
         """
@@ -101,7 +150,7 @@ class Config:
             storage_class or (globals_context and type(globals_context.storage)) or cls.DEFAULT_STORAGE_CLASS
         )
         if storage_class == cls.DEFAULT_STORAGE_CLASS:
-            context.logger.debug(f'Assumed to use `{cls.DEFAULT_STORAGE_CLASS}`.')
+            context.logger.debug('Assumed to use `%s`.', cls.DEFAULT_STORAGE_CLASS)
 
         _class = cls._import_cls_string(storage_class) if isinstance(storage_class, str) else storage_class
         # check Storage params
@@ -110,6 +159,33 @@ class Config:
         )
         context.storage = _class(context=context, **context.storage_params)
 
+        # check consumer cache params
+        context.consumer_cache_params = (
+            consumer_cache_params
+            or (globals_context and globals_context.consumer_cache_params)
+            or cls.DEFAULT_CONSUMER_CACHE_PARAMS
+        )
+
+        # check JWT params
+        context.jwt_params = jwt_params or (globals_context and globals_context.jwt_params) or cls.DEFAULT_JWT_PARAMS
+
+        # check effective permissions cache params
+        context.effective_permissions_cache_params = (
+            effective_permissions_cache_params
+            or (globals_context and globals_context.effective_permissions_cache_params)
+            or cls.DEFAULT_EFFECTIVE_PERMISSIONS_CACHE_PARAMS
+        )
+
+        # check rejected token cache params
+        context.rejected_token_cache_params = (
+            rejected_token_cache_params
+            or (globals_context and globals_context.rejected_token_cache_params)
+            or cls.DEFAULT_REJECTED_TOKEN_CACHE_PARAMS
+        )
+
+        # check tracer
+        context.tracer = tracer or (globals_context and globals_context.tracer)
+
         # Customize init
         context.kwargs = kwargs
         context.customize_init()
@@ -117,7 +193,7 @@ class Config:
         # Finally, init WebBridge
         bridge_class = bridge_class or (globals_context and type(globals_context.bridge)) or cls.DEFAULT_BRIDGE_CLASS
         if bridge_class == cls.DEFAULT_BRIDGE_CLASS:
-            context.logger.debug(f'Assumed to use `{cls.DEFAULT_BRIDGE_CLASS}`.')
+            context.logger.debug('Assumed to use `%s`.', cls.DEFAULT_BRIDGE_CLASS)
 
         _class = cls._import_cls_string(bridge_class) if isinstance(bridge_class, str) else bridge_class
         context.bridge = _class(context=context)
@@ -1,8 +1,77 @@
 import base64
+from functools import partial
+from typing import TYPE_CHECKING, Iterable, Optional, Union
 
+from .cache import TTLCache
+from .encoding import decode_permission_bitmask
 from .enum import ErrorCode, PermissionAggregationTypeEnum
 from .exception import AuthException
-from .model import Consumer, PermissionModel
+from .model import Consumer, PermissionModel, RequiredPermissions
+from .tracing import SPAN_BITMASK_CHECK, SPAN_STORAGE_LOOKUP
+
+if TYPE_CHECKING:
+    from .storage import CatalogSnapshot
+
+_numpy = None
+
+
+def _import_numpy():
+    """Import NumPy on the first batch authorization, so that `import web_auth` doesn't pay for it."""
+    global _numpy  # pylint: disable=global-statement
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+
+class PermissionBatch(object):
+    """Many (permissions, aggregation type) requirements evaluated together by `BitmaskAuthorization.authorize_many`.
+
+    The requirements are compiled once per storage version into integer masks, and into flat index arrays for NumPy
+    if it's available, so build a batch once and reuse it for every request.
+    """
+
+    NUMPY_MIN_SIZE = 64  # smaller batches are evaluated faster with integer masks
+
+    def __init__(self, requirements: Iterable[tuple[Union[str, Iterable[str]], PermissionAggregationTypeEnum]] = ()):
+        self.requirements: list[RequiredPermissions] = [
+            RequiredPermissions({permissions} if isinstance(permissions, str) else permissions, aggregation_type)
+            for permissions, aggregation_type in requirements
+        ]
+        self.compiled = None  # (storage version, masks, numpy arrays)
+
+    def __len__(self) -> int:
+        return len(self.requirements)
+
+    def compile(self, storage, snapshot: Optional['CatalogSnapshot'] = None):
+        """Compile the requirements against the `snapshot`, the current one of the `storage` by default."""
+        if snapshot is None:
+            snapshot = storage.snapshot
+        version = snapshot.version
+        if self.compiled is not None and self.compiled[0] == version:
+            return self.compiled
+
+        masks, indexes = [], []
+        for permissions in self.requirements:
+            permission_models = snapshot.get_permissions(permissions)
+            masks.append(BitmaskAuthorization.make_permission_mask(permissions, permission_models))
+            indexes.append([p.bitmask_idx for p in permission_models])
+
+        arrays = None
+        numpy = _import_numpy()
+        if numpy is not None and len(self.requirements) >= self.NUMPY_MIN_SIZE:
+            arrays = (
+                numpy.array([i for idx in indexes for i in idx], dtype=numpy.int64),  # flat bit indexes
+                numpy.repeat(numpy.arange(len(indexes)), [len(idx) for idx in indexes]),  # requirement of each index
+                numpy.array([len(p) for p in self.requirements], dtype=numpy.int64),  # required count
+                numpy.array([m.bit_length() if m is not None else -1 for m in masks], dtype=numpy.int64),
+                numpy.array([p.aggregation_type == PermissionAggregationTypeEnum.ALL for p in self.requirements]),
+            )
+        self.compiled = (version, masks, arrays)
+        return self.compiled
 
 
 class BitmaskAuthorization(object):
@@ -10,6 +79,13 @@ class BitmaskAuthorization(object):
 
     If the user lacks the necessary permissions, an `AuthException` is raised, including the relevant error
     code as defined in `ErrorCode`.
+
+    The bitmask is decoded into an integer, and the required permissions are folded into an integer mask, so the check
+    is a single AND/compare regardless of the bitmask length. The mask of a `RequiredPermissions` is compiled once per
+    storage version and kept by the view. The granted codenames of a consumer are looked up when its
+    `effective_permissions` are read. If the bridge has an effective permissions cache, they are cached per bitmask
+    and storage version, so a consumer of a bitmask seen before is granted by a subset check. The string-based
+    `convert_base64encoded_to_bitmask` and `check_permissions` are kept for compatibility.
     """
 
     def __init__(self, context):
@@ -27,20 +103,257 @@ class BitmaskAuthorization(object):
         :param permissions: the permissions the users required
         :param aggregation_type: aggregate method of applying permissions; all permissions are needed or just any.
         """
-        permission_bitmask = self.convert_base64encoded_to_bitmask(consumer.permission_bitmask)
-        self.check_permissions(
-            permissions,
-            aggregation_type,
-            permission_bitmask,
-            self.context.storage.get_permissions(permissions),
+        tracer = getattr(self.context, 'tracer', None)
+        if tracer is None:
+            self.context.storage.get_permissions()  # refresh the storage if it's expired
+            self._authorize(consumer, permissions, aggregation_type)
+            return
+
+        with tracer.start_as_current_span(SPAN_STORAGE_LOOKUP):
+            self.context.storage.get_permissions()
+        with tracer.start_as_current_span(SPAN_BITMASK_CHECK):
+            self._authorize(consumer, permissions, aggregation_type)
+
+    async def aauthorize(
+        self,
+        consumer: Consumer,
+        permissions: set[str],
+        aggregation_type: PermissionAggregationTypeEnum,
+    ):
+        """Async variant of `authorize`. An expired storage is refreshed off the event loop before checking."""
+        tracer = getattr(self.context, 'tracer', None)
+        if tracer is None:
+            await self.context.storage.aget_permissions()
+        else:
+            with tracer.start_as_current_span(SPAN_STORAGE_LOOKUP):
+                await self.context.storage.aget_permissions()
+
+        if type(self).authorize is not BitmaskAuthorization.authorize:
+            # Honor a subclass that only customizes `authorize`
+            self.authorize(consumer, permissions, aggregation_type)
+        elif tracer is None:
+            self._authorize(consumer, permissions, aggregation_type)
+        else:
+            with tracer.start_as_current_span(SPAN_BITMASK_CHECK):
+                self._authorize(consumer, permissions, aggregation_type)
+
+    def _authorize(
+        self,
+        consumer: Consumer,
+        permissions: set[str],
+        aggregation_type: PermissionAggregationTypeEnum,
+    ):
+        snapshot = self.context.storage.snapshot
+        effective_permissions_cache = self.get_effective_permissions_cache()
+        if effective_permissions_cache is not None:
+            # Short-circuit if the granted codenames of the bitmask are cached
+            effective_permissions = effective_permissions_cache.get((consumer.permission_bitmask, snapshot.version))
+            if effective_permissions is not None:
+                granted = (
+                    effective_permissions.issuperset(permissions)
+                    if aggregation_type == PermissionAggregationTypeEnum.ALL
+                    else not permissions or not effective_permissions.isdisjoint(permissions)
+                )
+                if granted:
+                    consumer.effective_permissions = effective_permissions
+                    return
+                # Denied, check the masks for the exact error code
+
+        # Every step reads the same snapshot, so a reload in between can't mix two catalogs
+        permission_bitmask, permission_bitmask_len = self.get_granted_bitmask(consumer.permission_bitmask, snapshot)
+        required_mask = self.get_permission_mask(permissions, snapshot)
+        self.check_permission_mask(required_mask, aggregation_type, permission_bitmask, permission_bitmask_len)
+        # Looked up only if the view reads them
+        consumer._effective_permissions_resolver = partial(
+            self._get_effective_permissions, consumer.permission_bitmask, permission_bitmask, snapshot
         )
 
+    def get_effective_permissions_cache(self) -> Optional[TTLCache]:
+        bridge = getattr(self.context, 'bridge', None)
+        return getattr(bridge, 'effective_permissions_cache', None)
+
+    def get_effective_permissions(self, consumer: Consumer) -> frozenset[str]:
+        """Return the codenames of the permissions granted to the `consumer` by the current catalog.
+        If the bridge has an effective permissions cache, they are cached per (bitmask, storage version), so that
+        consumers sharing a role bitmask share the set.
+        """
+        storage = self.context.storage
+        storage.get_permissions()  # refresh the storage if it's expired
+        snapshot = storage.snapshot
+        permission_bitmask, _ = self.get_granted_bitmask(consumer.permission_bitmask, snapshot)
+        consumer.effective_permissions = self._get_effective_permissions(
+            consumer.permission_bitmask, permission_bitmask, snapshot
+        )
+        return consumer.effective_permissions
+
+    def _get_effective_permissions(
+        self, base64_permissions: str, permission_bitmask: int, snapshot: 'CatalogSnapshot'
+    ) -> frozenset[str]:
+        key = (base64_permissions, snapshot.version)
+        effective_permissions_cache = self.get_effective_permissions_cache()
+        if effective_permissions_cache is not None:
+            effective_permissions = effective_permissions_cache.get(key)
+            if effective_permissions is not None:
+                return effective_permissions
+
+        # Only the bits of the catalog are scanned, however long the bitmask is, so a forged bitmask costs no more
+        catalog = snapshot.catalog
+        bits = format(permission_bitmask & ((1 << catalog.bitmask_len) - 1), 'b')[::-1]
+        bitmask_idx_index = catalog.bitmask_idx_index
+        codenames = []
+        bitmask_idx = bits.find('1')
+        while bitmask_idx >= 0:
+            permission = bitmask_idx_index.get(bitmask_idx)
+            if permission is not None:
+                codenames.append(permission.codename)
+            bitmask_idx = bits.find('1', bitmask_idx + 1)
+        effective_permissions = frozenset(codenames)
+
+        if effective_permissions_cache is not None:
+            effective_permissions_cache.set(key, effective_permissions)
+        return effective_permissions
+
+    def authorize_many(
+        self,
+        consumer: Consumer,
+        requirements: Union[PermissionBatch, Iterable[tuple[Union[str, Iterable[str]], PermissionAggregationTypeEnum]]],
+    ) -> list[bool]:
+        """Evaluate many requirements for a consumer at once, e.g. to render the actions a user may perform.
+
+        The bitmask is decoded once, and each requirement is granted or not in the returned list. A requirement with
+        unknown permissions, or permissions beyond the bitmask, is not granted rather than raising.
+
+        :param consumer: the consumer of returning from Authentication
+        :param requirements: a `PermissionBatch`, or (permissions, aggregation type) pairs
+        :return: whether each requirement is granted, in order
+        """
+        batch = requirements if isinstance(requirements, PermissionBatch) else PermissionBatch(requirements)
+        storage = self.context.storage
+        storage.get_permissions()  # refresh the storage if it's expired
+        snapshot = storage.snapshot
+        _, masks, arrays = batch.compile(storage, snapshot)
+        permission_bitmask, permission_bitmask_len = self.get_granted_bitmask(consumer.permission_bitmask, snapshot)
+
+        if arrays is not None:
+            return self._authorize_many_by_numpy(arrays, permission_bitmask, permission_bitmask_len)
+
+        granted = []
+        for permissions, required_mask in zip(batch.requirements, masks):
+            if required_mask is None or required_mask.bit_length() > permission_bitmask_len:
+                granted.append(False)
+            elif permissions.aggregation_type == PermissionAggregationTypeEnum.ALL:
+                granted.append(permission_bitmask & required_mask == required_mask)
+            else:
+                granted.append(not required_mask or bool(permission_bitmask & required_mask))
+        return granted
+
+    @staticmethod
+    def _authorize_many_by_numpy(arrays: tuple, permission_bitmask: int, permission_bitmask_len: int) -> list[bool]:
+        numpy = _import_numpy()
+        flat_idx, segment_ids, required_counts, mask_bit_lengths, is_all = arrays
+        # bits[i] is the bit of `bitmask_idx` i
+        bits = numpy.unpackbits(
+            numpy.frombuffer(permission_bitmask.to_bytes((permission_bitmask_len + 7) // 8, 'big'), dtype=numpy.uint8)
+        )[::-1]
+        valid = (mask_bit_lengths >= 0) & (mask_bit_lengths <= permission_bitmask_len)
+        in_range = flat_idx < permission_bitmask_len
+        hits = numpy.bincount(segment_ids[in_range], weights=bits[flat_idx[in_range]], minlength=len(required_counts))
+        granted = valid & numpy.where(is_all, hits == required_counts, (hits > 0) | (required_counts == 0))
+        return granted.tolist()
+
+    def get_granted_bitmask(
+        self, base64_permissions: str, snapshot: Optional['CatalogSnapshot'] = None
+    ) -> tuple[int, int]:
+        """Decode the bitmask into an integer and its length in bits, like `convert_base64encoded_to_int`, and OR the
+        precomputed mask of each role it grants into it, see `CatalogSnapshot.expand_roles`. A sparse or run-length
+        bitmask is decoded only up to the length of the catalog, since the bits beyond it grant nothing.
+        The catalog is the `snapshot`, the current one of the storage by default.
+        """
+        if snapshot is None:
+            snapshot = self.context.storage.snapshot
+        if isinstance(base64_permissions, str) and ':' in base64_permissions:
+            permission_bitmask, permission_bitmask_len = decode_permission_bitmask(
+                base64_permissions, snapshot.catalog.bitmask_len
+            )
+        else:
+            permission_bitmask, permission_bitmask_len = self.convert_base64encoded_to_int(base64_permissions)
+        if permission_bitmask & snapshot.catalog.roles_mask:
+            permission_bitmask = snapshot.expand_roles(permission_bitmask)
+            permission_bitmask_len = max(permission_bitmask_len, permission_bitmask.bit_length())
+        return permission_bitmask, permission_bitmask_len
+
+    @staticmethod
+    def convert_base64encoded_to_int(base64_permissions: str) -> tuple[int, int]:
+        """Decode the base64-encoded bitmask into an integer and its length in bits.
+        The `bitmask_idx`-th bit of the integer (counting from the least significant bit) grants that permission.
+        A sparse or run-length encoded bitmask, which is tagged by a `:`, is decoded into the same integer, see
+        `web_auth.core.encoding`.
+        """
+        if isinstance(base64_permissions, str) and ':' in base64_permissions:
+            return decode_permission_bitmask(base64_permissions)
+        try:
+            decoded_bytes = base64.b64decode(base64_permissions)
+        except Exception:
+            raise AuthException('Bad base64-encoded permission bitmask', ErrorCode.BAD_BASE64_ENCODED)
+
+        return int.from_bytes(decoded_bytes, 'big'), len(decoded_bytes) * 8
+
+    def get_permission_mask(self, permissions: set[str], snapshot: Optional['CatalogSnapshot'] = None) -> Optional[int]:
+        """Return the mask of the `permissions` from the `snapshot`, the current catalog by default, without refreshing
+        the storage. It is compiled only once per storage version if the `permissions` is a `RequiredPermissions`,
+        otherwise for every call.
+        """
+        if snapshot is None:
+            snapshot = self.context.storage.snapshot
+        if not isinstance(permissions, RequiredPermissions):
+            return self.make_permission_mask(permissions, snapshot.get_permissions(permissions))
+
+        version, required_mask = permissions.compiled_mask
+        if version != snapshot.version:
+            version = snapshot.version
+            required_mask = self.make_permission_mask(permissions, snapshot.get_permissions(permissions))
+            permissions.compiled_mask = (version, required_mask)  # one tuple, so the mask never tears from its version
+        return required_mask
+
+    @staticmethod
+    def make_permission_mask(permissions: set[str], permission_models: list[PermissionModel]) -> Optional[int]:
+        """Fold the `bitmask_idx` of the `permissions` into an integer mask.
+        Return None if any of the `permissions` is not found in `permission_models`.
+        """
+        permission_codename_bitmap = {p.codename: p.bitmask_idx for p in permission_models}
+        required_mask = 0
+        for codename in permissions:
+            bitmask_idx = permission_codename_bitmap.get(codename)
+            if bitmask_idx is None or bitmask_idx < 0:
+                return None
+            required_mask |= 1 << bitmask_idx
+        return required_mask
+
+    @staticmethod
+    def check_permission_mask(
+        required_mask: Optional[int],
+        aggregation_type: PermissionAggregationTypeEnum,
+        permission_bitmask: int,
+        permission_bitmask_len: int,
+    ):
+        if required_mask is None or required_mask.bit_length() > permission_bitmask_len:
+            raise AuthException('Bad permission bitmask', ErrorCode.BAD_BITMASK)
+
+        granted_mask = permission_bitmask & required_mask
+        if aggregation_type == PermissionAggregationTypeEnum.ALL and granted_mask != required_mask:
+            raise AuthException('Permission denied', ErrorCode.PERMISSION_DENIED)
+        if aggregation_type == PermissionAggregationTypeEnum.ANY and required_mask and not granted_mask:
+            raise AuthException('Permission denied', ErrorCode.PERMISSION_DENIED)
+
     @staticmethod
     def convert_base64encoded_to_bitmask(base64_permissions: str) -> str:
+        if isinstance(base64_permissions, str) and ':' in base64_permissions:
+            permission_bitmask, permission_bitmask_len = decode_permission_bitmask(base64_permissions)
+            return format(permission_bitmask, f'0{permission_bitmask_len}b') if permission_bitmask_len else ''
         try:
             decoded_bytes = base64.b64decode(base64_permissions)
         except Exception:
-            raise AuthException(f'Bad base64-encoded `{base64_permissions}`', ErrorCode.BAD_BASE64_ENCODED)
+            raise AuthException('Bad base64-encoded permission bitmask', ErrorCode.BAD_BASE64_ENCODED)
 
         permission_bitmask = ''.join(['{:08b}'.format(v) for v in decoded_bytes])
         return permission_bitmask
@@ -57,10 +370,13 @@ class BitmaskAuthorization(object):
         for codename in permissions:
             bitmask_idx = permission_codename_bitmap.get(codename)
             if bitmask_idx is None or not 0 <= bitmask_idx < permission_bitmask_len:
-                raise AuthException(f'Bad permission bitmask `{permission_bitmask}`', ErrorCode.BAD_BITMASK)
+                raise AuthException('Bad permission bitmask', ErrorCode.BAD_BITMASK)
 
             bit_chat = permission_bitmask[permission_bitmask_len - bitmask_idx - 1]
             if bit_chat == '0' and aggregation_type == PermissionAggregationTypeEnum.ALL:
                 raise AuthException('Permission denied', ErrorCode.PERMISSION_DENIED)
             if bit_chat == '1' and aggregation_type == PermissionAggregationTypeEnum.ANY:
                 return None
+
+        if permissions and aggregation_type == PermissionAggregationTypeEnum.ANY:
+            raise AuthException('Permission denied', ErrorCode.PERMISSION_DENIED)
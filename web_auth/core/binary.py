@@ -0,0 +1,325 @@
+"""The compiled binary permission catalog read by `BinaryFileStorage`.
+
+All integers are little-endian. The file is laid out as follows:
+
+- header: magic `WABC`, format version (u16), reserved (u16), record count, codename index slot count, bitmask_idx
+  table size, role count, and the offsets of the records, the codename index, the bitmask_idx table, the role table
+  and the strings (u32 each).
+- records: (bitmask_idx (i32), codename, name, service, implies) per permission, where the last four are string
+  offsets, or `NO_STRING` for None. The implied codenames of a role are a JSON array.
+- codename index: an open-addressing hash table of `record index + 1` (0 for an empty slot), probed linearly from
+  `crc32(codename) & (slot count - 1)`.
+- bitmask_idx table: `record index + 1` at each bitmask_idx, 0 for a gap.
+- role table: the record index of each role, so the roles are found without scanning the records.
+- strings: interned UTF-8 strings, each prefixed by its length (u32). Equal strings are stored once.
+
+Convert a JSON catalog by `python -m web_auth.core.binary permissions.json permissions.bin`.
+"""
+import json
+import mmap
+import struct
+import sys
+import zlib
+from collections.abc import Mapping
+from typing import Iterable, Iterator, Optional, Sequence, Union
+
+from .model import PermissionModel
+
+HEADER = struct.Struct('<4sHHIIIIIIIII')
+RECORD = struct.Struct('<iIIII')
+SLOT = struct.Struct('<I')
+STRING_LENGTH = struct.Struct('<I')
+MAGIC = b'WABC'
+FORMAT_VERSION = 2
+NO_STRING = 0xFFFFFFFF
+
+
+def compile_catalog(permission_models: Sequence[PermissionModel]) -> bytes:
+    """Compile the `permission_models` into the binary catalog format."""
+    strings = bytearray()
+    string_offsets: dict[str, int] = {}
+
+    def intern(value: Optional[str]) -> int:
+        if value is None:
+            return NO_STRING
+        offset = string_offsets.get(value)
+        if offset is None:
+            encoded = value.encode()
+            offset = string_offsets[value] = len(strings)
+            strings.extend(STRING_LENGTH.pack(len(encoded)))
+            strings.extend(encoded)
+        return offset
+
+    count = len(permission_models)
+    slot_count = 1
+    while slot_count < count * 2:
+        slot_count <<= 1
+    slots = [0] * slot_count
+    bitmask_table_size = max((p.bitmask_idx + 1 for p in permission_models), default=0)
+    bitmask_table = [0] * bitmask_table_size
+
+    records = bytearray()
+    role_ids = []
+    for record_idx, permission in enumerate(permission_models):
+        records.extend(
+            RECORD.pack(
+                permission.bitmask_idx,
+                intern(permission.codename),
+                intern(permission.name),
+                intern(permission.service),
+                intern(json.dumps(permission.implies, separators=(',', ':')) if permission.implies else None),
+            )
+        )
+        slot = zlib.crc32(permission.codename.encode()) & (slot_count - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (slot_count - 1)
+        slots[slot] = record_idx + 1
+        if permission.bitmask_idx >= 0:
+            bitmask_table[permission.bitmask_idx] = record_idx + 1
+        if permission.implies:
+            role_ids.append(record_idx)
+
+    records_offset = HEADER.size
+    index_offset = records_offset + len(records)
+    bitmask_table_offset = index_offset + slot_count * SLOT.size
+    roles_offset = bitmask_table_offset + bitmask_table_size * SLOT.size
+    strings_offset = roles_offset + len(role_ids) * SLOT.size
+    header = HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        0,
+        count,
+        slot_count,
+        bitmask_table_size,
+        len(role_ids),
+        records_offset,
+        index_offset,
+        bitmask_table_offset,
+        roles_offset,
+        strings_offset,
+    )
+    return b''.join(
+        [
+            header,
+            bytes(records),
+            struct.pack(f'<{slot_count}I', *slots),
+            struct.pack(f'<{bitmask_table_size}I', *bitmask_table),
+            struct.pack(f'<{len(role_ids)}I', *role_ids),
+            bytes(strings),
+        ]
+    )
+
+
+def convert_json_to_binary(json_file_path: str, binary_file_path: str):
+    """Compile the JSON catalog read by `JsonFileStorage` into a binary catalog file."""
+    with open(json_file_path, encoding='utf8') as fp:
+        permission_models = [PermissionModel(**permission) for permission in json.load(fp)]
+    with open(binary_file_path, 'wb') as fp:
+        fp.write(compile_catalog(permission_models))
+
+
+class BinaryCatalog(object):
+    """A binary catalog in a buffer, typically a `mmap`, that resolves lookups without materializing every model.
+    It has the same indexes as `PermissionCatalog`, so `Storage` reads either of them alike. If `services` is given,
+    the permissions of the other services are looked up as unknown permissions. The roles are materialized to resolve
+    their masks.
+    """
+
+    def __init__(self, buffer: Union[mmap.mmap, bytes], services: Optional[Iterable[Optional[str]]] = None):
+        self.buffer = buffer
+        (
+            magic,
+            format_version,
+            _,
+            self.count,
+            self.slot_count,
+            self.bitmask_table_size,
+            role_count,
+            self.records_offset,
+            self.index_offset,
+            self.bitmask_table_offset,
+            roles_offset,
+            self.strings_offset,
+        ) = HEADER.unpack_from(buffer)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError('Not a binary permission catalog')
+        self._models: dict[int, PermissionModel] = {}  # materialized on lookup, by record index
+        self.record_ids: Optional[list[int]] = None  # the records of the selected services, if they're selected
+        self._selected_record_ids: Optional[set[int]] = None
+        if services is not None:
+            services = set(services)
+            self.record_ids = [record_idx for record_idx, service in self.iter_services() if service in services]
+            self._selected_record_ids = set(self.record_ids)
+        self.permission_models = _PermissionList(self)
+        self.codename_index = _CodenameIndex(self)
+        self.bitmask_idx_index = _BitmaskIdxIndex(self)
+        self.service_index = _ServiceIndex(self)
+        from .storage import resolve_role_masks
+
+        role_ids = struct.unpack_from(f'<{role_count}I', buffer, roles_offset)
+        self.role_masks: dict[int, int] = resolve_role_masks(
+            [self.get_model(record_idx) for record_idx in role_ids if self._select(record_idx) is not None],
+            self.codename_index,
+        )
+        self.roles_mask = sum(1 << idx for idx in self.role_masks)
+        self.bitmask_len = self.bitmask_table_size
+
+    def read_string(self, offset: int) -> Optional[str]:
+        if offset == NO_STRING:
+            return None
+        start = self.strings_offset + offset + STRING_LENGTH.size
+        (length,) = STRING_LENGTH.unpack_from(self.buffer, start - STRING_LENGTH.size)
+        return self.buffer[start : start + length].decode()
+
+    def iter_services(self) -> Iterator[tuple[int, Optional[str]]]:
+        """Iterate the (record index, service) of all the records, decoding each interned service once."""
+        services: dict[int, Optional[str]] = {}  # interned service offset -> service
+        records = self.buffer[self.records_offset : self.index_offset]
+        for record_idx, (_, _, _, offset, _) in enumerate(RECORD.iter_unpack(records)):
+            service = services.get(offset, services)
+            if service is services:
+                service = services[offset] = self.read_string(offset)
+            yield record_idx, service
+
+    def _read_codename_bytes(self, record_idx: int) -> bytes:
+        (offset,) = SLOT.unpack_from(self.buffer, self.records_offset + record_idx * RECORD.size + 4)
+        start = self.strings_offset + offset + STRING_LENGTH.size
+        (length,) = STRING_LENGTH.unpack_from(self.buffer, start - STRING_LENGTH.size)
+        return self.buffer[start : start + length]
+
+    def get_model(self, record_idx: int) -> PermissionModel:
+        model = self._models.get(record_idx)
+        if model is None:
+            bitmask_idx, codename, name, service, implies = RECORD.unpack_from(
+                self.buffer, self.records_offset + record_idx * RECORD.size
+            )
+            model = PermissionModel(
+                bitmask_idx=bitmask_idx,
+                codename=self.read_string(codename),
+                name=self.read_string(name),
+                service=self.read_string(service),
+            )
+            if implies != NO_STRING:
+                model.implies = json.loads(self.read_string(implies))
+            self._models[record_idx] = model
+        return model
+
+    def find_codename(self, codename: str) -> Optional[int]:
+        """Return the record index of the `codename`, or None."""
+        if not self.slot_count:
+            return None
+        encoded = codename.encode()
+        mask = self.slot_count - 1
+        slot = zlib.crc32(encoded) & mask
+        while True:
+            (entry,) = SLOT.unpack_from(self.buffer, self.index_offset + slot * SLOT.size)
+            if not entry:
+                return None
+            if self._read_codename_bytes(entry - 1) == encoded:
+                return self._select(entry - 1)
+            slot = (slot + 1) & mask
+
+    def _select(self, record_idx: Optional[int]) -> Optional[int]:
+        selected_record_ids = self._selected_record_ids
+        if selected_record_ids is None or record_idx in selected_record_ids:
+            return record_idx
+        return None
+
+    def find_bitmask_idx(self, bitmask_idx: int) -> Optional[int]:
+        """Return the record index of the `bitmask_idx`, or None."""
+        if not 0 <= bitmask_idx < self.bitmask_table_size:
+            return None
+        (entry,) = SLOT.unpack_from(self.buffer, self.bitmask_table_offset + bitmask_idx * SLOT.size)
+        return self._select(entry - 1) if entry else None
+
+
+class _PermissionList(Sequence):
+    """All the models of a `BinaryCatalog`, materialized as they are read."""
+
+    def __init__(self, catalog: BinaryCatalog):
+        self.catalog = catalog
+        self.record_ids = catalog.record_ids
+
+    def __len__(self) -> int:
+        return self.catalog.count if self.record_ids is None else len(self.record_ids)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        return self.catalog.get_model(idx if self.record_ids is None else self.record_ids[idx])
+
+    def __eq__(self, other) -> bool:
+        return list(self) == other
+
+
+class _CodenameIndex(Mapping):
+    def __init__(self, catalog: BinaryCatalog):
+        self.catalog = catalog
+
+    def __getitem__(self, codename: str) -> PermissionModel:
+        record_idx = self.catalog.find_codename(codename) if isinstance(codename, str) else None
+        if record_idx is None:
+            raise KeyError(codename)
+        return self.catalog.get_model(record_idx)
+
+    def __contains__(self, codename) -> bool:
+        return isinstance(codename, str) and self.catalog.find_codename(codename) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return (p.codename for p in self.catalog.permission_models)
+
+    def __len__(self) -> int:
+        return len(self.catalog.permission_models)
+
+
+class _BitmaskIdxIndex(Mapping):
+    def __init__(self, catalog: BinaryCatalog):
+        self.catalog = catalog
+
+    def __getitem__(self, bitmask_idx: int) -> PermissionModel:
+        record_idx = self.catalog.find_bitmask_idx(bitmask_idx) if isinstance(bitmask_idx, int) else None
+        if record_idx is None:
+            raise KeyError(bitmask_idx)
+        return self.catalog.get_model(record_idx)
+
+    def __iter__(self) -> Iterator[int]:
+        return (p.bitmask_idx for p in self.catalog.permission_models)
+
+    def __len__(self) -> int:
+        return len(self.catalog.permission_models)
+
+
+class _ServiceIndex(Mapping):
+    """The models of a service, found by comparing the interned service offsets of the records."""
+
+    def __init__(self, catalog: BinaryCatalog):
+        self.catalog = catalog
+        self._services: dict[Optional[str], list[PermissionModel]] = {}
+
+    def __getitem__(self, service: Optional[str]) -> list[PermissionModel]:
+        permission_models = self._services.get(service)
+        if permission_models is None:
+            catalog = self.catalog
+            permission_models = [
+                catalog.get_model(record_idx)
+                for record_idx, record_service in catalog.iter_services()
+                if record_service == service and catalog._select(record_idx) is not None
+            ]
+            if not permission_models:
+                raise KeyError(service)
+            self._services[service] = permission_models
+        return permission_models
+
+    def __iter__(self) -> Iterator[Optional[str]]:
+        return iter({p.service for p in self.catalog.permission_models})
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+if __name__ == '__main__':
+    convert_json_to_binary(*sys.argv[1:3])
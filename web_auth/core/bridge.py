@@ -1,13 +1,21 @@
 import abc
+import contextvars
+import hashlib
+import logging
 import re
-from typing import Type
-
-import jwt
+from functools import partial
+from inspect import signature
+from typing import TYPE_CHECKING, Optional, Type
 
 from .authorization import BitmaskAuthorization
+from .cache import TTLCache
 from .enum import ErrorCode, PermissionAggregationTypeEnum
 from .exception import AuthException
 from .model import Consumer
+from .tracing import SPAN_ACCESS_CONTROL, SPAN_AUTHENTICATE, SPAN_JWT_DECODE, Tracer
+
+if TYPE_CHECKING:
+    from .verification import JWTVerifier
 
 
 class WebBridge(abc.ABC):
@@ -17,6 +25,15 @@ class WebBridge(abc.ABC):
     To do so, you need to inject a `Authorization` interface implementation and implement two abstract methods:
      1. `create_view_func_wrapper`: Create a callable to wrap view functions to require `permissions` to perform.
      2. `authenticate`: Authenticate requests and return (consumer, consumer_auth_type)
+
+    If the context has `consumer_cache_params`, the decoded payloads of JWT tokens are cached by the raw token and never
+    outlive the token's `exp`. If the context has `jwt_params`, the signature and claims of JWT tokens are verified by
+    a `JWTVerifier`, otherwise the tokens are decoded without verification. If the context has
+    `effective_permissions_cache_params`, the granted codenames of the bitmasks are cached per catalog version. The
+    tokens failing to decode for good, i.e. the `cacheable` failures, are remembered by their hash in a cache bounded by
+    the `rejected_token_cache_params`, so a replayed bad token is rejected with its original error code without
+    decoding it again; a token signed by a rotated-in key is accepted as soon as the JWKS has the key. If the context
+    has a `tracer`, the access control phases are wrapped in its spans, see `Tracer`.
     """
 
     authorization_class: Type[BitmaskAuthorization] = BitmaskAuthorization
@@ -26,6 +43,39 @@ class WebBridge(abc.ABC):
 
     def __init__(self, context):
         self.context = context
+        consumer_cache_params = getattr(context, 'consumer_cache_params', None)
+        self.consumer_cache: Optional[TTLCache] = TTLCache(**consumer_cache_params) if consumer_cache_params else None
+        effective_permissions_cache_params = getattr(context, 'effective_permissions_cache_params', None)
+        self.effective_permissions_cache: Optional[TTLCache] = (
+            TTLCache(**effective_permissions_cache_params) if effective_permissions_cache_params else None
+        )
+        rejected_token_cache_params = getattr(context, 'rejected_token_cache_params', None)
+        self.rejected_token_cache: Optional[TTLCache] = (
+            TTLCache(**rejected_token_cache_params) if rejected_token_cache_params else None
+        )
+        self.tracer: Optional[Tracer] = getattr(context, 'tracer', None)
+        jwt_params = getattr(context, 'jwt_params', None)
+        self.jwt_verifier: Optional['JWTVerifier'] = None
+        if jwt_params:
+            from .verification import JWTVerifier
+
+            self.jwt_verifier = JWTVerifier(**jwt_params, logger=getattr(context, 'logger', None))
+
+    def get_consumer_parameter_name(self, func: callable) -> Optional[str]:
+        """Return the name of the view function parameter annotated with a `Consumer` or the `consumer_class`.
+        It reads `__annotations__` rather than building an `inspect.Signature`, which is slow at startup.
+        """
+        annotations = getattr(func, '__annotations__', None)
+        if annotations is None:
+            annotations = {k: v.annotation for k, v in signature(func).parameters.items()}
+
+        consumer_class = self.consumer_class
+        for name, annotation in annotations.items():
+            if name == 'return' or not isinstance(annotation, type):
+                continue
+            if issubclass(annotation, Consumer) or annotation is consumer_class:
+                return name
+        return None
 
     @staticmethod
     def extract_from_bearer_token(bearer_token) -> str:
@@ -34,11 +84,68 @@ class WebBridge(abc.ABC):
 
     @staticmethod
     def decode_jwt_token(token) -> dict:
+        import jwt  # PyJWT is imported by the first token rather than by `import web_auth`
+
         try:
             payload = jwt.decode(token, options={'verify_signature': False})
             return payload
-        except (jwt.exceptions.DecodeError, jwt.exceptions.InvalidTokenError):
-            raise AuthException(f'Bad token `{token}`', ErrorCode.BAD_JWT)
+        except jwt.exceptions.DecodeError:
+            raise AuthException('Bad token', ErrorCode.BAD_JWT, cacheable=True) from None
+        except jwt.exceptions.InvalidTokenError:
+            raise AuthException('Bad token', ErrorCode.BAD_JWT) from None
+
+    def authenticate_jwt_token(self, token: str) -> Consumer:
+        """Decode the JWT `token`, or take the cached payload of the same token, and create a consumer.
+        The consumer is created for every request, since the authorization writes its `effective_permissions`.
+        """
+        consumer_cache = self.consumer_cache
+        if consumer_cache is not None:
+            jwt_payload = consumer_cache.get(token)
+            if jwt_payload is not None:
+                return self._create_jwt_consumer(token, jwt_payload)
+
+        rejected_token_cache = self.rejected_token_cache
+        if rejected_token_cache is not None:
+            # Keyed by a digest rather than the token, so the garbage tokens take 16 bytes each however long they are
+            token_digest = hashlib.blake2b(token.encode(), digest_size=16).digest()
+            code = rejected_token_cache.get(token_digest)
+            if code is not None:
+                raise AuthException('Bad token', code)
+
+        try:
+            if self.tracer is None:
+                jwt_payload = self.jwt_verifier.decode(token) if self.jwt_verifier else self.decode_jwt_token(token)
+            else:
+                with self.tracer.start_as_current_span(SPAN_JWT_DECODE):
+                    jwt_payload = self.jwt_verifier.decode(token) if self.jwt_verifier else self.decode_jwt_token(token)
+        except AuthException as exception:
+            if rejected_token_cache is not None and exception.cacheable:
+                rejected_token_cache.set(token_digest, exception.code)
+            raise
+        consumer = self._create_jwt_consumer(token, jwt_payload)
+        if consumer_cache is not None:
+            exp = jwt_payload.get('exp')
+            consumer_cache.set(
+                token, jwt_payload, expires_at=exp if isinstance(exp, (int, float)) else consumer.user.exp
+            )
+        return consumer
+
+    async def aauthenticate_jwt_token(self, token: str) -> Consumer:
+        """Async variant of `authenticate_jwt_token`. The token is decoded in the default executor if the verifier may
+        fetch the JWKS over the network, see `JWTVerifier.fetches_keys`, otherwise in memory on the event loop.
+        """
+        if self.jwt_verifier is not None and self.jwt_verifier.fetches_keys:
+            return await _run_in_executor(self.authenticate_jwt_token, token)
+        return self.authenticate_jwt_token(token)
+
+    @staticmethod
+    def _create_jwt_consumer(token: str, jwt_payload: dict) -> Consumer:
+        return Consumer(
+            permission_bitmask=jwt_payload['permission_bitmask'],
+            auth_scheme='JWT',
+            credential=token,
+            user_payload=jwt_payload,  # the `JWTUser` is built on first access
+        )
 
     def access_control(
         self,
@@ -57,12 +164,60 @@ class WebBridge(abc.ABC):
         :return: a consumer with type of `Consumer` or `pydantic.BaseModel`
         """
 
-        self.context.logger.debug(f'Bridging request `{request}` require permissions `{permissions}`')
-        consumer = self.authenticate(request)
-        self.context.logger.debug(f'Authenticated consumer.user `{consumer.user}` with scheme `{consumer.auth_scheme}`')
+        tracer = self.tracer
+        if tracer is not None:
+            with tracer.start_as_current_span(SPAN_ACCESS_CONTROL):
+                return self._access_control(request, permissions, aggregation_type, tracer)
+        return self._access_control(request, permissions, aggregation_type)
+
+    def _access_control(
+        self, request, permissions: set[str], aggregation_type: PermissionAggregationTypeEnum, tracer=None
+    ) -> Consumer:
+        logger = self.context.logger
+        logger.debug('Bridging request `%s` require permissions `%s`', request, permissions)
+        if tracer is None:
+            consumer = self.authenticate(request)
+        else:
+            with tracer.start_as_current_span(SPAN_AUTHENTICATE):
+                consumer = self.authenticate(request)
+        if logger.isEnabledFor(logging.DEBUG):  # don't build the lazy `consumer.user` otherwise
+            logger.debug('Authenticated consumer.user `%s` with scheme `%s`', consumer.user, consumer.auth_scheme)
         authorization: BitmaskAuthorization = self.get_authorization_class()(context=self.context)
         authorization.authorize(consumer, permissions, aggregation_type)
-        self.context.logger.debug('The consumer required permissions are granted')
+        logger.debug('The consumer required permissions are granted')
+        return consumer
+
+    async def aaccess_control(
+        self,
+        request,
+        permissions: set[str],
+        aggregation_type: PermissionAggregationTypeEnum = PermissionAggregationTypeEnum.ALL,
+    ) -> Consumer:
+        """Async variant of `access_control`, which calls `aauthenticate` and `Authorization.aauthorize` so that
+        neither of them blocks the event loop.
+        """
+
+        tracer = self.tracer
+        if tracer is not None:
+            with tracer.start_as_current_span(SPAN_ACCESS_CONTROL):
+                return await self._aaccess_control(request, permissions, aggregation_type, tracer)
+        return await self._aaccess_control(request, permissions, aggregation_type)
+
+    async def _aaccess_control(
+        self, request, permissions: set[str], aggregation_type: PermissionAggregationTypeEnum, tracer=None
+    ) -> Consumer:
+        logger = self.context.logger
+        logger.debug('Bridging request `%s` require permissions `%s`', request, permissions)
+        if tracer is None:
+            consumer = await self.aauthenticate(request)
+        else:
+            with tracer.start_as_current_span(SPAN_AUTHENTICATE):
+                consumer = await self.aauthenticate(request)
+        if logger.isEnabledFor(logging.DEBUG):  # don't build the lazy `consumer.user` otherwise
+            logger.debug('Authenticated consumer.user `%s` with scheme `%s`', consumer.user, consumer.auth_scheme)
+        authorization: BitmaskAuthorization = self.get_authorization_class()(context=self.context)
+        await authorization.aauthorize(consumer, permissions, aggregation_type)
+        logger.debug('The consumer required permissions are granted')
         return consumer
 
     def get_authorization_class(self) -> Type[BitmaskAuthorization]:
@@ -87,3 +242,21 @@ class WebBridge(abc.ABC):
         :type request: Union['fastapi.Request', 'flask.Request', 'django.http.Request' ... etc.]
         :return: an instance of `Consumer` or its derived class
         """
+
+    async def aauthenticate(self, request) -> Consumer:
+        """Async variant of `authenticate`. It calls `authenticate` by default, which only decodes the token in memory,
+        or in the default executor if the verifier may fetch the JWKS over the network; override it if the
+        authentication needs other I/O.
+        """
+        if self.jwt_verifier is not None and self.jwt_verifier.fetches_keys:
+            return await _run_in_executor(self.authenticate, request)
+        return self.authenticate(request)
+
+
+async def _run_in_executor(func, *args):
+    """Run `func` in the default executor with a copy of the current context, so the spans of the tracer keep their
+    parent, like `asyncio.to_thread` of Python 3.9.
+    """
+    import asyncio  # imported by the running event loop already, unlike by `import web_auth`
+
+    return await asyncio.get_running_loop().run_in_executor(None, partial(contextvars.copy_context().run, func, *args))
@@ -0,0 +1,50 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache(object):
+    """A thread-safe LRU cache bounded by `maxsize`, whose entries expire after `ttl` seconds or at their own
+    deadline, whichever comes first. It counts `hits` and `misses` for monitoring.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: int = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None):
+        """Cache the `value` until `expires_at` (a UNIX timestamp) or `ttl` seconds later, whichever comes first."""
+        utc_now = time.time()
+        deadline = utc_now + self.ttl if expires_at is None else min(utc_now + self.ttl, expires_at)
+        if deadline <= utc_now or self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (value, deadline)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -1,9 +1,11 @@
 import logging
-from typing import Any, Iterable, Union
+from typing import Any, Iterable, Optional, Union
 
 from .bridge import WebBridge
 from .enum import PermissionAggregationTypeEnum
+from .model import RequiredPermissions
 from .storage import Storage
+from .tracing import Tracer
 
 
 class Context:
@@ -11,22 +13,53 @@ class Context:
 
     storage: Storage
     storage_params: dict[str, Any]
+    consumer_cache_params: Optional[dict[str, Any]]
+    jwt_params: Optional[dict[str, Any]]
+    effective_permissions_cache_params: Optional[dict[str, Any]]
+    rejected_token_cache_params: Optional[dict[str, Any]]
+    tracer: Optional[Tracer]
     bridge: WebBridge
     logger: logging.Logger
     logger_name: str
     kwargs: dict[str, Any]
+    # The `RequiredPermissions` by (permissions, aggregation type), shared by the views requiring the same ones. It's
+    # created by the first view, so a subclass defining its own `__init__` needn't call `super().__init__()`.
+    _required_permissions_cache: dict[tuple, RequiredPermissions]
 
     def _validate_required_permissions(self, required_permissions: Union[str, Iterable[str]]) -> set[str]:
         validated_permissions = (
             {required_permissions} if isinstance(required_permissions, str) else set(required_permissions)
         )
-        _permission_keys: set[str] = set(model.codename for model in self.storage.get_permissions())
+        if not self.storage.loaded:
+            # Don't load a lazy storage to decorate views; the unknown permissions fail as `BAD_BITMASK` on requests
+            return validated_permissions
 
-        if not validated_permissions <= _permission_keys:
-            self.logger.error(f'Invalid required permissions, it should be a subset of {_permission_keys}')
+        invalid_permissions = {
+            codename for codename in validated_permissions if not self.storage.get_permission(codename)
+        }
+
+        if invalid_permissions:
+            self.logger.error('Invalid required permissions %s, they are not found in the storage', invalid_permissions)
 
         return validated_permissions
 
+    def _get_required_permissions(
+        self, required_permissions: Union[str, Iterable[str]], aggregation_type: PermissionAggregationTypeEnum
+    ) -> RequiredPermissions:
+        """Validate and return the `RequiredPermissions`, which is shared by the views requiring the same permissions,
+        so that they are validated once and their mask is compiled once.
+        """
+        key = (
+            required_permissions if isinstance(required_permissions, str) else frozenset(required_permissions),
+            aggregation_type,
+        )
+        required_permissions_cache = self.__dict__.setdefault('_required_permissions_cache', {})
+        permissions = required_permissions_cache.get(key)
+        if permissions is None:
+            permissions = RequiredPermissions(self._validate_required_permissions(key[0]), aggregation_type)
+            required_permissions_cache[key] = permissions
+        return permissions
+
     def __call__(
         self, required_permissions: Union[str, Iterable[str]] = (), aggregation_type=PermissionAggregationTypeEnum.ALL
     ) -> callable:
@@ -37,7 +70,7 @@ class Context:
         :return: a callable(view-func decorator) object created by the `WebBridge`.
         """
 
-        permissions = self._validate_required_permissions(required_permissions)
+        permissions = self._get_required_permissions(required_permissions, aggregation_type)
         return self.bridge.create_view_func_wrapper(
             permissions=permissions,
             aggregation_type=aggregation_type,
@@ -14,3 +14,16 @@ class ErrorCode(str, Enum):
     BAD_BASE64_ENCODED = 4030
     BAD_BITMASK = 4031
     PERMISSION_DENIED = 4032
+
+
+@unique
+class StorageRefreshModeEnum(str, Enum):
+    INLINE = 'inline'  # the request that finds the catalog expired reloads it
+    BACKGROUND = 'background'  # a daemon thread reloads the catalog ahead of expiry
+
+
+@unique
+class BitmaskEncodingEnum(str, Enum):
+    DENSE = 'dense'  # base64 of the whole bitmask
+    SPARSE = 'sparse'  # the gaps between the granted bits
+    RUN_LENGTH = 'run_length'  # the lengths of the denied and granted runs
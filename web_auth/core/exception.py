@@ -1,5 +1,7 @@
 class AuthException(Exception):
-    def __init__(self, message, code):
+    def __init__(self, message, code, cacheable: bool = False):
         super().__init__(message)
         self.message = message
         self.code = code
+        # Whether the failure is permanent, e.g. a malformed token, so the credential can be rejected from a cache
+        self.cacheable = cacheable
@@ -1,8 +1,10 @@
 from dataclasses import dataclass
-from typing import Any, Optional, Union
+from typing import Any, Callable, Iterable, Optional, Union
 
 import pydantic
 
+from .enum import PermissionAggregationTypeEnum
+
 
 @dataclass
 class PermissionModel:
@@ -10,6 +12,26 @@ class PermissionModel:
     codename: str
     name: Optional[str]
     service: Optional[str]
+    implies: Optional[list[str]] = None  # the codenames granted by a role, which may be roles themselves
+
+
+class RequiredPermissions(frozenset):
+    """The permission codenames required by a view, compiled into a bitmask once per storage version.
+
+    It is a `frozenset` of codenames, so it can be used wherever a `set[str]` of permissions is expected.
+    """
+
+    __slots__ = ('aggregation_type', 'compiled_mask')
+
+    def __new__(
+        cls,
+        permissions: Iterable[str] = (),
+        aggregation_type: PermissionAggregationTypeEnum = PermissionAggregationTypeEnum.ALL,
+    ):
+        self = super().__new__(cls, permissions)
+        self.aggregation_type = aggregation_type
+        self.compiled_mask: tuple[Optional[int], Optional[int]] = (None, None)  # (storage version, mask)
+        return self
 
 
 class ErrorMessageModel(pydantic.BaseModel):
@@ -38,14 +60,31 @@ class Consumer(object):
             return {"permission_bitmask": consumer.permission_bitmask, 'account': '33125689/jack'}
 
     The consumer parameter can be an instance derived from `web_auth.Consumer` or depends on your authentication logic
+
+    Its attributes are slots, and the `user` is built from the `user_payload` by the `user_class` on first access, since
+    most views never read it. Likewise, the `effective_permissions` are looked up on first access once authorized. A
+    subclass without `__slots__` gets a `__dict__` for its own attributes as usual.
     """
 
+    __slots__ = (
+        'permission_bitmask',
+        'auth_scheme',
+        'credential',
+        '_effective_permissions',
+        '_effective_permissions_resolver',
+        '_user',
+        '_user_payload',
+    )
+
+    user_class: type = JWTUser
+
     def __init__(
         self,
         permission_bitmask: str,
-        user: Union[JWTUser, Any],
+        user: Union[JWTUser, Any] = None,
         auth_scheme: Optional[str] = None,
         credential: Optional[str] = None,
+        user_payload: Optional[dict[str, Any]] = None,
     ):
         """Initialize a Consumer instance with the given permission bitmask.
 
@@ -53,8 +92,39 @@ class Consumer(object):
         :param user: It may vary based on the authentication logic. By default, it's a `JWTUser`.
         :param auth_scheme:The authorization scheme indicate what type of credentials are following: JWT, Basic.
         :param credential: Typically extracted from the HTTP header `Authorization`.
+        :param user_payload: The claims to build the `user` by the `user_class` on first access if `user` is omitted.
         """
         self.permission_bitmask = permission_bitmask
-        self.user = user
+        self._user = user
+        self._user_payload = user_payload if user is None else None
         self.auth_scheme = auth_scheme
         self.credential = credential
+        self._effective_permissions: Optional[frozenset[str]] = None
+        # Set by `BitmaskAuthorization` once the consumer is authorized, and called on first access
+        self._effective_permissions_resolver: Optional[Callable[[], frozenset[str]]] = None
+
+    @property
+    def user(self) -> Union[JWTUser, Any]:
+        if self._user_payload is not None:
+            self._user = self.user_class(**self._user_payload)
+            self._user_payload = None
+        return self._user
+
+    @user.setter
+    def user(self, user: Union[JWTUser, Any]):
+        self._user = user
+        self._user_payload = None
+
+    @property
+    def effective_permissions(self) -> Optional[frozenset[str]]:
+        """The granted permission codenames, or None if the consumer is not authorized yet."""
+        resolver = self._effective_permissions_resolver
+        if resolver is not None:
+            self._effective_permissions = resolver()
+            self._effective_permissions_resolver = None
+        return self._effective_permissions
+
+    @effective_permissions.setter
+    def effective_permissions(self, effective_permissions: Optional[frozenset[str]]):
+        self._effective_permissions = effective_permissions
+        self._effective_permissions_resolver = None
@@ -0,0 +1,172 @@
+import mmap
+import os
+import struct
+import threading
+import time
+import weakref
+from datetime import datetime
+from typing import Optional
+
+from .binary import BinaryCatalog, compile_catalog
+from .storage import Storage
+
+# magic, format version, generation, payload length
+HEADER = struct.Struct('<4sIQQ')
+MAGIC = b'WAPC'
+FORMAT_VERSION = 2  # the payload is a binary catalog, see `web_auth.core.binary`
+GENERATION_OFFSET = 8
+LENGTH_OFFSET = 16
+
+
+class SharedCatalogPublisher(object):
+    """Publish the catalog of a `storage` into a memory-mapped file, which `SharedCatalogStorage` instances in other
+    processes read, so a pre-forked server loads and refreshes the catalog once rather than once per worker::
+
+        # e.g. in the gunicorn `on_starting` hook of the master process
+        publisher = SharedCatalogPublisher(JsonFileStorage(ttl=60, permission_file_path='permissions.json'), path)
+        publisher.start()
+
+        # in the workers
+        web_auth.configure(storage_class=SharedCatalogStorage, storage_params={'ttl': 1, 'shared_catalog_path': path})
+
+    The catalog is compiled once into the binary catalog format, and written in place like a seqlock: the generation
+    in the header is odd while the payload is written and even once it's complete, so readers notice a new catalog by
+    reading 8 bytes and retry if they catch a write. The file is sparse and `capacity` bounds the payload.
+    """
+
+    def __init__(self, storage: Storage, shared_catalog_path: str, capacity: int = 16 * 1024 * 1024):
+        self.storage = storage
+        self.shared_catalog_path = shared_catalog_path
+        self.capacity = capacity
+        self._published_version: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+        fd = os.open(shared_catalog_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < HEADER.size + capacity:
+                os.ftruncate(fd, HEADER.size + capacity)
+            self._mmap = mmap.mmap(fd, HEADER.size + capacity)
+        finally:
+            os.close(fd)
+
+        magic, _, generation, _ = HEADER.unpack_from(self._mmap)
+        self._generation = generation if magic == MAGIC else 0
+        self.publish()
+
+    def publish(self) -> bool:
+        """Publish the catalog of the storage if its version is changed. Return whether it's published."""
+        with self._lock:
+            snapshot = self.storage.get_snapshot()
+            permission_models, version = snapshot.catalog.permission_models, snapshot.version
+            if version == self._published_version:
+                return False
+
+            payload = compile_catalog(permission_models)
+            if len(payload) > self.capacity:
+                raise ValueError(f'The catalog of {len(payload)} bytes exceeds the capacity of {self.capacity} bytes')
+
+            writing_generation = self._generation + 1 if self._generation % 2 == 0 else self._generation + 2
+            struct.pack_into('<Q', self._mmap, GENERATION_OFFSET, writing_generation)
+            self._mmap[HEADER.size : HEADER.size + len(payload)] = payload
+            struct.pack_into('<Q', self._mmap, LENGTH_OFFSET, len(payload))
+            HEADER.pack_into(self._mmap, 0, MAGIC, FORMAT_VERSION, writing_generation + 1, len(payload))
+            self._generation = writing_generation + 1
+            self._published_version = version
+            return True
+
+    def start(self, interval: float = 1):
+        """Check the storage and publish its changed catalog in a daemon thread every `interval` seconds. The storage
+        itself reloads the catalog once per `ttl`.
+        """
+        thread = threading.Thread(
+            target=self._run,
+            args=(weakref.ref(self), self._stop_event, interval),
+            name=f'{type(self).__name__}-publish',
+            daemon=True,
+        )
+        weakref.finalize(self, self._stop_event.set)
+        thread.start()
+
+    @staticmethod
+    def _run(publisher_ref: weakref.ref, stop_event: threading.Event, interval: float):
+        while not stop_event.wait(interval):
+            publisher: Optional[SharedCatalogPublisher] = publisher_ref()
+            if publisher is None:
+                return
+            try:
+                publisher.publish()
+            except Exception:
+                publisher.storage.logger.exception('Failed to publish the shared permission catalog')
+            del publisher
+
+    def close(self):
+        self._stop_event.set()
+        with self._lock:
+            self._mmap.close()
+
+
+class SharedCatalogStorage(Storage):
+    """Read the permission catalog published by a `SharedCatalogPublisher` from the memory-mapped
+    `shared_catalog_path`. Every process maps the same pages, and the catalog is copied out only when the generation
+    in the header is changed, so a small `ttl` costs an 8-byte read per poll.
+
+    The copy is the compact binary catalog, which is looked up by a `BinaryCatalog` without parsing it, so a worker
+    materializes only the models it looks up. It's a copy rather than a view of the shared pages, since the publisher
+    overwrites them in place.
+    """
+
+    RETRY_INTERVAL = 0.001
+    MAX_RETRIES = 100
+
+    def __init__(self, ttl: int, shared_catalog_path: str, context=None, **kwargs):
+        self.shared_catalog_path = shared_catalog_path
+        self._mmap: Optional[mmap.mmap] = None
+        self._generation = 0
+        super().__init__(ttl=ttl, context=context, **kwargs)
+
+    def _map(self) -> mmap.mmap:
+        with open(self.shared_catalog_path, 'rb') as fp:
+            shared_mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap is not None:
+            self._mmap.close()
+        self._mmap = shared_mmap
+        return shared_mmap
+
+    def _load_permissions(self) -> BinaryCatalog:
+        shared_mmap = self._mmap or self._map()
+        catalog = self._catalog
+        if catalog is not None and self._read_generation(shared_mmap) == self._generation:
+            return catalog
+
+        for _ in range(self.MAX_RETRIES):
+            magic, format_version, generation, length = HEADER.unpack_from(shared_mmap)
+            if magic != MAGIC or format_version != FORMAT_VERSION:
+                raise ValueError(f'`{self.shared_catalog_path}` is not a published permission catalog')
+            if generation % 2 == 0:
+                if HEADER.size + length > len(shared_mmap):
+                    shared_mmap = self._map()  # the publisher enlarged the capacity
+                    continue
+                payload = shared_mmap[HEADER.size : HEADER.size + length]
+                # The length and the payload may be torn by a write started after the header was read, unless the
+                # generation is still the same once they're copied
+                if self._read_generation(shared_mmap) == generation:
+                    self._generation = generation
+                    return BinaryCatalog(payload, services=self.services)
+                continue
+            time.sleep(self.RETRY_INTERVAL)  # the publisher is writing
+        raise TimeoutError(f'`{self.shared_catalog_path}` is being written for too long')
+
+    def _publish_permissions(self, permission_models: BinaryCatalog, utc_now: datetime):
+        # A new generation is a new catalog; comparing it with the previous one would materialize both
+        self._publish_catalog(permission_models if permission_models is not self._catalog else None, utc_now)
+
+    @staticmethod
+    def _read_generation(shared_mmap: mmap.mmap) -> int:
+        return struct.unpack_from('<Q', shared_mmap, GENERATION_OFFSET)[0]
+
+    def close(self):
+        super().close()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
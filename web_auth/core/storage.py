@@ -1,43 +1,540 @@
 import abc
 import json
+import logging
+import mmap
+import os
+import threading
+import weakref
+from dataclasses import dataclass, replace
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import TYPE_CHECKING, Callable, Iterable, Optional, Union
+from urllib.parse import urlsplit
 
+from .binary import BinaryCatalog
+from .enum import StorageRefreshModeEnum
 from .model import PermissionModel
+from .watcher import InotifyWatcher
+
+if TYPE_CHECKING:
+    import http.client
+
+
+def resolve_role_masks(
+    permission_models: Iterable[PermissionModel], codename_index: dict[str, PermissionModel]
+) -> dict[int, int]:
+    """Return the mask of each role by its `bitmask_idx`, which has the bit of the role and the bits of the permissions
+    it implies transitively. The implied codenames not in the `codename_index` are skipped, and cyclic roles imply
+    each other's permissions.
+    """
+    implied_idx: dict[int, list[int]] = {}
+    for permission in permission_models:
+        if permission.implies and permission.bitmask_idx >= 0:
+            implied_idx[permission.bitmask_idx] = [
+                codename_index[codename].bitmask_idx
+                for codename in permission.implies
+                if codename in codename_index and codename_index[codename].bitmask_idx >= 0
+            ]
+
+    role_masks = {idx: sum({1 << i for i in [idx, *implied]}) for idx, implied in implied_idx.items()}
+    # Fold the masks of the implied roles until nothing changes, which takes as many passes as the nesting depth
+    changed = True
+    while changed:
+        changed = False
+        for idx, implied in implied_idx.items():
+            mask = role_masks[idx]
+            for i in implied:
+                mask |= role_masks.get(i, 0)
+            if mask != role_masks[idx]:
+                role_masks[idx] = mask
+                changed = True
+    return role_masks
+
+
+class PermissionCatalog(object):
+    """The permission models loaded by a storage, indexed by codename, bitmask index and service.
+    The indexes, and the masks of the roles, are built once per reload.
+    """
+
+    __slots__ = (
+        'permission_models',
+        'codename_index',
+        'bitmask_idx_index',
+        'service_index',
+        'role_masks',
+        'roles_mask',
+        'bitmask_len',
+    )
+
+    def __init__(self, permission_models: list[PermissionModel]):
+        self.permission_models = permission_models
+        self.codename_index: dict[str, PermissionModel] = {p.codename: p for p in permission_models}
+        self.bitmask_idx_index: dict[int, PermissionModel] = {p.bitmask_idx: p for p in permission_models}
+        self.service_index: dict[Optional[str], list[PermissionModel]] = {}
+        for permission_model in permission_models:
+            self.service_index.setdefault(permission_model.service, []).append(permission_model)
+        self.role_masks: dict[int, int] = resolve_role_masks(permission_models, self.codename_index)
+        self.roles_mask = sum(1 << idx for idx in self.role_masks)  # the bits of all the roles
+        self.bitmask_len = max(self.bitmask_idx_index, default=-1) + 1  # the bits beyond it grant nothing
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """A catalog, its version and its expiry, published together by a storage. A snapshot is never mutated; a reload
+    publishes a new one by a single reference swap, so a reader holding a snapshot never sees the models of one
+    version with the indexes or the version number of another, without taking any lock.
+    """
+
+    catalog: Union[PermissionCatalog, BinaryCatalog]
+    version: int
+    expires_in: datetime
+
+    def get_permissions(self, permissions: Optional[set[str]] = None) -> list[PermissionModel]:
+        catalog = self.catalog
+        if permissions:
+            codename_index = catalog.codename_index
+            return [codename_index[codename] for codename in permissions if codename in codename_index]
+        return catalog.permission_models
+
+    def expand_roles(self, permission_bitmask: int) -> int:
+        """OR the mask of each role granted by the `permission_bitmask` into it."""
+        catalog = self.catalog
+        roles = permission_bitmask & catalog.roles_mask
+        while roles:
+            lowest_bit = roles & -roles
+            permission_bitmask |= catalog.role_masks[lowest_bit.bit_length() - 1]
+            roles ^= lowest_bit
+        return permission_bitmask
 
 
 class Storage(abc.ABC):
-    def __init__(self, ttl: int, context=None):
+    """Load the permission catalog and cache it for `ttl` seconds.
+
+    In `inline` refresh mode, the first request that finds the catalog expired reloads it while concurrent requests
+    keep reading the previous catalog. In `background` refresh mode, a daemon thread reloads the catalog ahead of
+    expiry, so requests never do I/O. Either way, a failed reload is logged and the previous catalog is kept.
+
+    `aget_permissions` is the async variant of `get_permissions`; it never runs the loader on the event loop.
+
+    If `services` is given, only the permissions of these services are loaded and indexed, and the others are looked
+    up as unknown permissions. The loaders skip the rows of the other services rather than filtering the models.
+
+    The catalog is published as an immutable `CatalogSnapshot`. Read the `snapshot` once to look up several things
+    from the same version, since the lookup methods each read the latest one.
+
+    A permission that `implies` other codenames is a role. Granting its bit grants the permissions it implies, as
+    expanded by `CatalogSnapshot.expand_roles`.
+
+    If `lazy`, the catalog is loaded by the first lookup rather than by the constructor, so that creating a storage
+    does no I/O; the short-lived processes that never authorize a request never load it.
+    """
+
+    REFRESH_AHEAD_RATIO = 0.8  # in background mode, reload when this ratio of the `ttl` is elapsed
+
+    def __init__(
+        self,
+        ttl: int,
+        context=None,
+        refresh_mode: Union[StorageRefreshModeEnum, str] = StorageRefreshModeEnum.INLINE,
+        services: Optional[Union[str, Iterable[Optional[str]]]] = None,
+        lazy: bool = False,
+    ):
         self.context = context
+        self.services: Optional[frozenset[Optional[str]]] = (
+            None if services is None else frozenset([services] if isinstance(services, str) else services)
+        )
+        self.refresh_mode = StorageRefreshModeEnum(refresh_mode)
         self._unsigned_ttl = 0 if ttl is None else abs(ttl)
-        self._expires_in = datetime.utcnow()
-        self._permission_models: Optional[list[PermissionModel]] = None
-        self._refresh_permissions()
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._refresh_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        if not lazy:
+            with self._refresh_lock:
+                self._reload_permissions()
+
+        if self.refresh_mode == StorageRefreshModeEnum.BACKGROUND:
+            if not self._unsigned_ttl:
+                raise ValueError('The `background` refresh mode requires a positive `ttl`')
+            self._start_background_refresh()
+
+    @property
+    def _catalog(self) -> Optional[Union[PermissionCatalog, BinaryCatalog]]:
+        snapshot = self._snapshot
+        return snapshot.catalog if snapshot else None
+
+    @property
+    def _permission_models(self) -> Optional[list[PermissionModel]]:
+        snapshot = self._snapshot
+        return snapshot.catalog.permission_models if snapshot else None
+
+    @property
+    def logger(self) -> logging.Logger:
+        return self.context.logger if self.context else logging.getLogger(__name__)
 
     @abc.abstractmethod
     def _load_permissions(self) -> list[PermissionModel]:
         raise NotImplementedError
 
-    def _refresh_permissions(self):
+    def _parse_permissions(self, rows: Iterable[dict]) -> list[PermissionModel]:
+        """Create the models of the `rows` of the selected `services`."""
+        services = self.services
+        if services is None:
+            return [PermissionModel(**row) for row in rows]
+        return [PermissionModel(**row) for row in rows if row.get('service') in services]
+
+    async def _aload_permissions(self) -> list[PermissionModel]:
+        """Load the catalog off the event loop. Override it if the storage has a native async loader."""
+        import asyncio  # imported by the running event loop already, unlike by `import web_auth`
+
+        return await asyncio.get_running_loop().run_in_executor(None, self._load_permissions)
+
+    def _reload_permissions(self):
+        """Load the catalog and publish it if it's changed. Must be called with `_refresh_lock` held."""
         utc_now = datetime.utcnow()
-        if self._expires_in <= utc_now:
-            self._permission_models = self._load_permissions()
-            self._expires_in = utc_now + timedelta(seconds=self._unsigned_ttl)
-            if self.context:
-                self.context.logger.debug(f'Refreshed permission cache, next time at `{self._expires_in}`')
+        try:
+            permission_models = self._load_permissions()
+        except Exception:
+            if self._permission_models is None:
+                raise
+            self._keep_permissions(utc_now)
+            return
+        self._publish_permissions(permission_models, utc_now)
 
-    def get_permissions(self, permissions: Optional[set[str]] = None) -> list[PermissionModel]:
-        self._refresh_permissions()
-        if permissions:
-            return [p for p in self._permission_models if p.codename in permissions]
-        return self._permission_models
+    async def _areload_permissions(self):
+        """Async variant of `_reload_permissions`."""
+        utc_now = datetime.utcnow()
+        try:
+            permission_models = await self._aload_permissions()
+        except Exception:
+            if self._permission_models is None:
+                raise
+            self._keep_permissions(utc_now)
+            return
+        self._publish_permissions(permission_models, utc_now)
+
+    def _publish_permissions(self, permission_models: list[PermissionModel], utc_now: datetime):
+        permission_catalog = None
+        previous_models = self._permission_models
+        if permission_models is not previous_models and permission_models != previous_models:
+            permission_catalog = PermissionCatalog(permission_models)
+        self._publish_catalog(permission_catalog, utc_now)
+
+    def _publish_catalog(self, catalog: Optional[Union[PermissionCatalog, BinaryCatalog]], utc_now: datetime):
+        """Publish a snapshot of the `catalog` as the next version, or of the previous catalog if it's None, which
+        expires `ttl` seconds later. Must be called with `_refresh_lock` held.
+        """
+        expires_in = utc_now + timedelta(seconds=self._unsigned_ttl)
+        snapshot = self._snapshot
+        if catalog is not None:
+            self._snapshot = CatalogSnapshot(catalog, snapshot.version + 1 if snapshot else 1, expires_in)
+        else:
+            self._snapshot = replace(snapshot, expires_in=expires_in)
+        self.logger.debug('Refreshed permission cache, next time at `%s`', expires_in)
+
+    def _keep_permissions(self, utc_now: datetime):
+        """Keep the previous catalog when the reload failed."""
+        self._snapshot = replace(self._snapshot, expires_in=utc_now + timedelta(seconds=self._unsigned_ttl))
+        self.logger.exception('Failed to refresh permission cache, keep using the previous one')
+
+    def _load_first_snapshot(self) -> CatalogSnapshot:
+        """Load the catalog of a lazy storage, blocking the concurrent lookups since they have nothing to read."""
+        with self._refresh_lock:
+            if self._snapshot is None:
+                self._reload_permissions()
+        return self._snapshot
+
+    def _refresh_permissions(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            self._load_first_snapshot()
+            return
+        if self.refresh_mode == StorageRefreshModeEnum.BACKGROUND or snapshot.expires_in > datetime.utcnow():
+            return
+
+        # Only one thread reloads, the others keep reading the previous snapshot meanwhile
+        if self._refresh_lock.acquire(blocking=False):
+            try:
+                if self._snapshot.expires_in <= datetime.utcnow():
+                    self._reload_permissions()
+            finally:
+                self._refresh_lock.release()
+
+    async def _arefresh_permissions(self):
+        """Async variant of `_refresh_permissions`, which reloads the catalog without blocking the event loop."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            import asyncio
+
+            await asyncio.get_running_loop().run_in_executor(None, self._load_first_snapshot)
+            return
+        if self.refresh_mode == StorageRefreshModeEnum.BACKGROUND or snapshot.expires_in > datetime.utcnow():
+            return
+
+        if self._refresh_lock.acquire(blocking=False):
+            try:
+                if self._snapshot.expires_in <= datetime.utcnow():
+                    await self._areload_permissions()
+            finally:
+                self._refresh_lock.release()
+
+    def _start_background_refresh(self):
+        thread = threading.Thread(
+            target=self._run_background_refresh,
+            args=(weakref.ref(self), self._stop_event, self._unsigned_ttl * self.REFRESH_AHEAD_RATIO),
+            name=f'{type(self).__name__}-refresh',
+            daemon=True,
+        )
+        weakref.finalize(self, self._stop_event.set)
+        thread.start()
+
+    @staticmethod
+    def _run_background_refresh(storage_ref: weakref.ref, stop_event: threading.Event, interval: float):
+        while not stop_event.wait(interval):
+            storage: Optional[Storage] = storage_ref()
+            if storage is None:
+                return
+            try:
+                with storage._refresh_lock:
+                    storage._reload_permissions()
+            except Exception:
+                # The first catalog of a lazy storage failed to load, so there's none to keep; retry at the next tick
+                storage.logger.exception('Failed to load permission cache, retry in %s seconds', interval)
+            del storage
+
+    def close(self):
+        """Stop the background refresh, if any."""
+        self._stop_event.set()
+
+    @property
+    def version(self) -> int:
+        """The catalog version, which is increased whenever a reload changes the permissions."""
+        return self.snapshot.version
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the first catalog is loaded, which is False only for a lazy storage before its first lookup."""
+        return self._snapshot is not None
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        """The latest published snapshot, without refreshing the storage. A lazy storage loads the first one."""
+        return self._snapshot or self._load_first_snapshot()
+
+    def get_snapshot(self, refresh: bool = True) -> CatalogSnapshot:
+        if refresh:
+            self._refresh_permissions()
+        return self.snapshot
+
+    def get_permissions(self, permissions: Optional[set[str]] = None, refresh: bool = True) -> list[PermissionModel]:
+        if refresh:
+            self._refresh_permissions()
+        return self.snapshot.get_permissions(permissions)
+
+    async def aget_permissions(self, permissions: Optional[set[str]] = None) -> list[PermissionModel]:
+        """Async variant of `get_permissions`. An expired catalog is reloaded by `_aload_permissions`, which runs the
+        loader in the default executor unless it's overridden.
+        """
+        await self._arefresh_permissions()
+        return self.snapshot.get_permissions(permissions)
+
+    def get_permission(self, codename: str, refresh: bool = True) -> Optional[PermissionModel]:
+        """Look up a permission by its codename."""
+        if refresh:
+            self._refresh_permissions()
+        return self.snapshot.catalog.codename_index.get(codename)
+
+    def get_permission_by_bitmask_idx(self, bitmask_idx: int, refresh: bool = True) -> Optional[PermissionModel]:
+        """Look up a permission by its bitmask index."""
+        if refresh:
+            self._refresh_permissions()
+        return self.snapshot.catalog.bitmask_idx_index.get(bitmask_idx)
+
+    def get_permissions_by_service(self, service: Optional[str], refresh: bool = True) -> list[PermissionModel]:
+        """Look up the permissions of a service."""
+        if refresh:
+            self._refresh_permissions()
+        return self.snapshot.catalog.service_index.get(service, [])
 
 
 class JsonFileStorage(Storage):
-    def __init__(self, ttl: int, permission_file_path: str, context=None):
+    """Load the permission catalog from a JSON file.
+
+    With `watch`, the file is reparsed only when its device, inode, size or mtime is changed, so the `ttl` is just the
+    interval of a cheap `stat` poll. With `inotify` (Linux only), the catalog is reloaded as soon as the file is
+    changed or replaced by an atomic rename, and the `ttl` poll becomes a fallback.
+    """
+
+    def __init__(
+        self,
+        ttl: int,
+        permission_file_path: str,
+        context=None,
+        watch: bool = False,
+        inotify: bool = False,
+        **kwargs,
+    ):
         self.permission_file_path = permission_file_path
-        super().__init__(ttl=ttl, context=context)
+        self.watch = watch or inotify
+        self._file_stat_key: Optional[tuple[int, int, int, int]] = None
+        self._watcher: Optional[InotifyWatcher] = None
+        super().__init__(ttl=ttl, context=context, **kwargs)
+
+        if inotify:
+            if InotifyWatcher.is_supported():
+                self._watcher = InotifyWatcher(self.permission_file_path, self._make_change_handler())
+                self._watcher.start()
+                weakref.finalize(self, self._watcher.stop)
+            else:
+                self.logger.warning('inotify is not supported, fall back to polling `%s`', self.permission_file_path)
+
+    @staticmethod
+    def _get_stat_key(stat: os.stat_result) -> tuple[int, int, int, int]:
+        return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
 
     def _load_permissions(self) -> list[PermissionModel]:
+        if (
+            self.watch
+            and self._permission_models is not None
+            and self._get_stat_key(os.stat(self.permission_file_path)) == self._file_stat_key
+        ):
+            return self._permission_models
+
         with open(self.permission_file_path, encoding='utf8') as fp:
-            return [PermissionModel(**permission) for permission in json.load(fp)]
+            file_stat_key = self._get_stat_key(os.fstat(fp.fileno()))
+            permission_models = self._parse_permissions(json.load(fp))
+        self._file_stat_key = file_stat_key
+        return permission_models
+
+    def _make_change_handler(self) -> Callable[[], None]:
+        storage_ref = weakref.ref(self)
+
+        def on_change():
+            storage: Optional[JsonFileStorage] = storage_ref()
+            if storage is not None:
+                with storage._refresh_lock:
+                    storage._reload_permissions()
+
+        return on_change
+
+    def close(self):
+        super().close()
+        if self._watcher:
+            self._watcher.stop()
+
+
+class BinaryFileStorage(JsonFileStorage):
+    """Load the permission catalog from a binary catalog file compiled by `web_auth.core.binary`.
+
+    The file is memory-mapped, and the lookups read the codename index and the bitmask_idx table of the file, so only
+    the models looked up are materialized. Like a watched `JsonFileStorage`, the file is remapped only when its
+    device, inode, size or mtime is changed, so replace it by an atomic rename rather than rewriting it in place.
+    """
+
+    def __init__(self, ttl: int, permission_file_path: str, context=None, inotify: bool = False, **kwargs):
+        kwargs.pop('watch', None)
+        super().__init__(ttl, permission_file_path, context=context, watch=True, inotify=inotify, **kwargs)
+
+    def _load_permissions(self) -> BinaryCatalog:
+        catalog = self._catalog
+        if catalog is not None and self._get_stat_key(os.stat(self.permission_file_path)) == self._file_stat_key:
+            return catalog
+
+        with open(self.permission_file_path, 'rb') as fp:
+            file_stat_key = self._get_stat_key(os.fstat(fp.fileno()))
+            catalog = BinaryCatalog(mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ), services=self.services)
+        self._file_stat_key = file_stat_key
+        return catalog
+
+    def _publish_permissions(self, permission_models: BinaryCatalog, utc_now: datetime):
+        # A remapped file is a new catalog; comparing it with the previous one would materialize both
+        self._publish_catalog(permission_models if permission_models is not self._catalog else None, utc_now)
+
+
+class HttpStorage(Storage):
+    """Load the permission catalog from one of the `permission_urls`.
+
+    Connections are kept alive and reused per host. The target that served the last catalog is tried first, and the
+    next targets are tried in turn when it fails. The `ETag` of the last catalog is sent as `If-None-Match` to the
+    target that served it, so an unchanged catalog costs a `304 Not Modified` instead of a download and reparse. The
+    other targets are never asked to revalidate it, since their ETags are not comparable.
+    """
+
+    def __init__(self, ttl: int, permission_urls: list[str], context=None, timeout: float = 5, **kwargs):
+        if not permission_urls:
+            raise ValueError('`permission_urls` should not be empty')
+        self.permission_urls = list(permission_urls)
+        self.timeout = timeout
+        self._target_idx = 0
+        self._etag: Optional[tuple[str, Optional[str]]] = None  # (url, ETag) of the last catalog
+        self._connections: dict[tuple[str, str], 'http.client.HTTPConnection'] = {}
+        super().__init__(ttl=ttl, context=context, **kwargs)
+
+    def _get_connection(self, scheme: str, netloc: str) -> 'http.client.HTTPConnection':
+        import http.client  # only the HTTP storage pays for it
+
+        connection = self._connections.get((scheme, netloc))
+        if connection is None:
+            connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+            connection = connection_class(netloc, timeout=self.timeout)
+            self._connections[(scheme, netloc)] = connection
+        return connection
+
+    def _fetch(self, url: str) -> Optional[tuple[bytes, Optional[str]]]:
+        """GET the `url` through a pooled connection. Return None if the catalog is not modified."""
+        import http.client
+
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path = f'{path}?{parts.query}'
+        headers = {'Accept': 'application/json'}
+        if self._etag and self._etag[0] == url and self._etag[1]:
+            headers['If-None-Match'] = self._etag[1]
+
+        connection = self._get_connection(parts.scheme, parts.netloc)
+        # A pooled connection may have been closed by the server while idle, so retry once on a fresh connection
+        for retry in (connection.sock is not None, False):
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+                break
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                if not retry:
+                    raise
+
+        if response.will_close:
+            connection.close()
+        if response.status == http.client.NOT_MODIFIED:
+            return None
+        if response.status != http.client.OK:
+            raise http.client.HTTPException(f'Unexpected status `{response.status}` from `{url}`')
+        return body, response.getheader('ETag')
+
+    def _load_permissions(self) -> list[PermissionModel]:
+        last_exception: Optional[Exception] = None
+        for offset in range(len(self.permission_urls)):
+            target_idx = (self._target_idx + offset) % len(self.permission_urls)
+            url = self.permission_urls[target_idx]
+            try:
+                fetched = self._fetch(url)
+                if fetched is None:
+                    self._target_idx = target_idx
+                    return self._permission_models
+                permission_models = self._parse_permissions(json.loads(fetched[0]))
+            except Exception as e:
+                self.logger.warning('Failed to load permissions from `%s`: %r', url, e)
+                last_exception = e
+                continue
+
+            self._target_idx = target_idx
+            self._etag = (url, fetched[1])
+            return permission_models
+
+        raise last_exception
+
+    def close(self):
+        super().close()
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
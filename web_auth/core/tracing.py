@@ -0,0 +1,57 @@
+import abc
+import logging
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+SPAN_ACCESS_CONTROL = 'web_auth.access_control'
+SPAN_AUTHENTICATE = 'web_auth.authenticate'  # token extraction, and the `SPAN_JWT_DECODE` child span
+SPAN_JWT_DECODE = 'web_auth.jwt_decode'
+SPAN_STORAGE_LOOKUP = 'web_auth.storage_lookup'
+SPAN_BITMASK_CHECK = 'web_auth.bitmask_check'
+
+
+class Tracer(abc.ABC):
+    """The instrumentation interface of the access control phases, compatible with `opentelemetry.trace.Tracer`,
+    so an OpenTelemetry tracer can be configured as the context `tracer` directly::
+
+        from opentelemetry import trace
+
+        web_auth.configure(tracer=trace.get_tracer('web_auth'))
+
+    The spans are nested as follows; the token extraction takes the `authenticate` span but its `jwt_decode` child::
+
+        web_auth.access_control
+        ├── web_auth.authenticate
+        │   └── web_auth.jwt_decode
+        ├── web_auth.storage_lookup
+        └── web_auth.bitmask_check
+
+    If no tracer is configured, the phases are not wrapped at all. Only `start_as_current_span` is called, so a tracer
+    needn't derive from this class.
+    """
+
+    @abc.abstractmethod
+    def start_as_current_span(self, name: str):
+        """Return a context manager that times the span `name`."""
+
+
+class LogTracer(Tracer):
+    """Log the duration of the spans taking `threshold` seconds or longer, to find the latency outliers without an
+    OpenTelemetry SDK.
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None, threshold: float = 0.0, level: int = logging.INFO):
+        self.logger = logger or logging.getLogger(__name__)
+        self.threshold = threshold
+        self.level = level
+
+    @contextmanager
+    def start_as_current_span(self, name: str) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started_at
+            if elapsed >= self.threshold:
+                self.logger.log(self.level, 'Span `%s` took %.3f ms', name, elapsed * 1000)
@@ -0,0 +1,192 @@
+import json
+import threading
+import time
+import urllib.request
+from typing import Any, Optional, Union
+
+import jwt
+from jwt.algorithms import get_default_algorithms
+
+from .cache import TTLCache
+from .enum import ErrorCode
+from .exception import AuthException
+
+
+class JWKSKeySource(object):
+    """Load a JWKS from a file or a URL, and keep its keys parsed into key objects by `kid`.
+
+    The JWKS is reloaded every `ttl` seconds, or when a token is signed by an unknown `kid` (a key rotation), but not
+    more often than every `min_reload_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        jwks_file_path: Optional[str] = None,
+        jwks_url: Optional[str] = None,
+        ttl: int = 300,
+        min_reload_interval: int = 10,
+        timeout: float = 5,
+        logger=None,
+    ):
+        if not (jwks_file_path or jwks_url):
+            raise ValueError('Either `jwks_file_path` or `jwks_url` is required')
+        self.jwks_file_path = jwks_file_path
+        self.jwks_url = jwks_url
+        self.ttl = ttl
+        self.min_reload_interval = min_reload_interval
+        self.timeout = timeout
+        self.logger = logger
+        self._keys: dict[Optional[str], jwt.PyJWK] = {}
+        self._loaded_at = 0.0
+        self._expires_in = 0.0
+        self._reload_lock = threading.Lock()
+        self._reload()
+
+    def _load_jwks(self) -> dict[str, Any]:
+        if self.jwks_file_path:
+            with open(self.jwks_file_path, encoding='utf8') as fp:
+                return json.load(fp)
+        request = urllib.request.Request(self.jwks_url, headers={'Accept': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.load(response)
+
+    def _reload(self):
+        keys = {}
+        for jwk in self._load_jwks().get('keys', []):
+            if jwk.get('use', 'sig') != 'sig':
+                continue
+            py_jwk = jwt.PyJWK(jwk)
+            keys[py_jwk.key_id] = py_jwk
+        self._keys = keys
+        self._loaded_at = time.monotonic()
+        self._expires_in = self._loaded_at + self.ttl
+
+    def _try_reload(self, force: bool):
+        now = time.monotonic()
+        if not force and now < self._expires_in:
+            return
+        if now - self._loaded_at < self.min_reload_interval or not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._reload()
+        except Exception:
+            # Keep the previous keys
+            self._expires_in = now + self.min_reload_interval
+            if self.logger:
+                self.logger.exception('Failed to reload the JWKS')
+        finally:
+            self._reload_lock.release()
+
+    def get_key(self, kid: Optional[str]) -> Optional[jwt.PyJWK]:
+        self._try_reload(force=False)
+        key = self._keys.get(kid)
+        if key is None:
+            self._try_reload(force=True)
+            key = self._keys.get(kid)
+        if key is None and kid is None and len(self._keys) == 1:
+            key = next(iter(self._keys.values()))
+        return key
+
+
+class JWTVerifier(object):
+    """Decode JWT tokens with their signature and claims verified.
+
+    Keys are parsed once: a static `key` (an HS secret, or a PEM public key) when it's configured, or the keys of a JWKS
+    source looked up by the `kid` header. The payloads of verified tokens are cached until they expire, so a repeated
+    token costs a cache lookup.
+
+    The failures that neither a JWKS reload nor time passing can fix, e.g. a malformed token or a bad signature, are
+    flagged `cacheable` for the rejected token cache of the bridge. An unknown key, or a token not valid yet, isn't.
+    """
+
+    PERMANENT_ERRORS = (
+        jwt.exceptions.DecodeError,  # including `InvalidSignatureError`
+        jwt.exceptions.ExpiredSignatureError,
+        jwt.exceptions.InvalidAudienceError,
+        jwt.exceptions.InvalidIssuerError,
+        jwt.exceptions.InvalidAlgorithmError,
+        jwt.exceptions.MissingRequiredClaimError,
+    )
+
+    def __init__(
+        self,
+        algorithms: list[str],
+        key: Union[str, bytes, None] = None,
+        jwks_file_path: Optional[str] = None,
+        jwks_url: Optional[str] = None,
+        jwks_ttl: int = 300,
+        jwks_min_reload_interval: int = 10,
+        audience: Optional[str] = None,
+        issuer: Optional[str] = None,
+        leeway: float = 0,
+        cache_maxsize: int = 1024,
+        cache_ttl: int = 60,
+        logger=None,
+    ):
+        if not algorithms:
+            raise ValueError('`algorithms` should not be empty')
+        if key is None and not (jwks_file_path or jwks_url):
+            raise ValueError('One of `key`, `jwks_file_path` or `jwks_url` is required')
+
+        self.algorithms = list(algorithms)
+        self.audience = audience
+        self.issuer = issuer
+        self.leeway = leeway
+        self.key_source: Optional[JWKSKeySource] = (
+            JWKSKeySource(
+                jwks_file_path=jwks_file_path,
+                jwks_url=jwks_url,
+                ttl=jwks_ttl,
+                min_reload_interval=jwks_min_reload_interval,
+                logger=logger,
+            )
+            if key is None
+            else None
+        )
+        self._prepared_key = None if key is None else get_default_algorithms()[self.algorithms[0]].prepare_key(key)
+        self.cache = TTLCache(maxsize=cache_maxsize, ttl=cache_ttl)
+
+    @property
+    def fetches_keys(self) -> bool:
+        """Whether decoding a token may fetch the JWKS over the network, i.e. on expiry or for an unknown `kid`. The
+        async bridges then decode tokens in the default executor rather than on the event loop.
+        """
+        return self.key_source is not None and bool(self.key_source.jwks_url)
+
+    def _get_key(self, token: str):
+        if self.key_source is None:
+            return self._prepared_key
+        try:
+            kid = jwt.get_unverified_header(token).get('kid')
+        except jwt.exceptions.DecodeError:
+            raise AuthException('Bad token', ErrorCode.BAD_JWT, cacheable=True) from None
+        key = self.key_source.get_key(kid)
+        if key is None:
+            raise AuthException('Bad token, unknown key', ErrorCode.BAD_JWT)
+        return key.key
+
+    def decode(self, token: str) -> dict:
+        payload = self.cache.get(token)
+        if payload is not None:
+            return payload
+
+        try:
+            payload = jwt.decode(
+                token,
+                key=self._get_key(token),
+                algorithms=self.algorithms,
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.leeway,
+            )
+        except self.PERMANENT_ERRORS:
+            raise AuthException('Bad token', ErrorCode.BAD_JWT, cacheable=True) from None
+        except jwt.exceptions.InvalidTokenError:
+            raise AuthException('Bad token', ErrorCode.BAD_JWT) from None
+        except (jwt.exceptions.InvalidKeyError, TypeError):
+            # The algorithm of the token doesn't fit the type of its key, e.g. ES256 with an RSA key
+            raise AuthException('Bad token', ErrorCode.BAD_JWT) from None
+
+        exp = payload.get('exp')
+        self.cache.set(token, payload, expires_at=exp if isinstance(exp, (int, float)) else None)
+        return payload
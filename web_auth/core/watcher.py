@@ -0,0 +1,104 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+from typing import Callable, Optional
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+
+_EVENT_HEADER = struct.Struct('iIII')  # struct inotify_event {int wd; uint32_t mask, cookie, len; char name[];}
+
+logger = logging.getLogger(__name__)
+
+
+class InotifyWatcher(object):
+    """Watch a file with Linux inotify and call `on_change` from a daemon thread whenever it's modified, created,
+    deleted, or replaced by an atomic rename.
+
+    The parent directory is watched rather than the file itself, because renaming a new file over it replaces the
+    inode the watch would have been attached to.
+    """
+
+    WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    POLL_INTERVAL = 1  # seconds between checks whether the watcher is stopped
+
+    _libc = None
+
+    def __init__(self, file_path: str, on_change: Callable[[], None]):
+        self.file_path = os.path.abspath(file_path)
+        self.on_change = on_change
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def is_supported(cls) -> bool:
+        if not sys.platform.startswith('linux'):
+            return False
+        if cls._libc is None:
+            try:
+                libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+                libc.inotify_init1, libc.inotify_add_watch
+            except (OSError, AttributeError):
+                return False
+            cls._libc = libc
+        return True
+
+    def start(self):
+        if not self.is_supported():
+            raise OSError('inotify is not supported on this platform')
+
+        fd = self._libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        directory, filename = os.path.split(self.file_path)
+        if self._libc.inotify_add_watch(fd, os.fsencode(directory), self.WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(errno, f'inotify_add_watch failed on `{directory}`')
+
+        self._thread = threading.Thread(
+            target=self._run, args=(fd, os.fsencode(filename)), name=f'inotify-{filename}', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self, fd: int, filename: bytes):
+        try:
+            while not self._stop_event.is_set():
+                readable, _, _ = select.select([fd], [], [], self.POLL_INTERVAL)
+                if not readable:
+                    continue
+                if self._read_events(fd, filename) and not self._stop_event.is_set():
+                    try:
+                        self.on_change()
+                    except Exception:
+                        logger.exception('Failed to handle the change of `%s`', self.file_path)
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _read_events(fd: int, filename: bytes) -> bool:
+        """Drain the pending events and return whether any of them is about the `filename`."""
+        changed = False
+        while True:
+            try:
+                buffer = os.read(fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(buffer):
+                _, _, _, name_len = _EVENT_HEADER.unpack_from(buffer, offset)
+                offset += _EVENT_HEADER.size
+                if buffer[offset : offset + name_len].rstrip(b'\0') == filename:
+                    changed = True
+                offset += name_len
@@ -1,8 +1,8 @@
+import asyncio
 from functools import wraps
 from inspect import signature
-from typing import Type
 
-from web_auth import AuthException, Consumer, Context, ErrorCode, JWTUser, PermissionAggregationTypeEnum, WebBridge
+from web_auth import AuthException, Consumer, Context, ErrorCode, PermissionAggregationTypeEnum, WebBridge
 
 
 class DjangoBridge(WebBridge):
@@ -15,43 +15,44 @@ class DjangoBridge(WebBridge):
         aggregation_type: PermissionAggregationTypeEnum,
     ) -> callable:
         """Factory method. Creates a callable object to wrap view functions and require certain permissions to perform.
+        An `async def` view is wrapped by a coroutine function, whose authorization doesn't block the event loop.
         """
 
         def decorator(func):
-            func_signature = signature(func)
-
-            consumer_class: Type[Consumer] = self.consumer_class
-            consumer_parma_name = next(
-                (
-                    k
-                    for k, v in func_signature.parameters.items()
-                    if issubclass(v.annotation, Consumer) or v.annotation is consumer_class
-                ),
-                None,
-            )
+            consumer_parma_name = self.get_consumer_parameter_name(func)
             if consumer_parma_name:
                 self.context.logger.debug(
-                    f'declare parameter `{consumer_parma_name}` with type {consumer_class} in view `{func}`'
+                    'declare parameter `%s` with type %s in view `%s`', consumer_parma_name, self.consumer_class, func
                 )
 
-            @wraps(func)
-            def wrapper(request, *args, **kwargs):
-                consumer = self.access_control(request, permissions, aggregation_type)
+            if asyncio.iscoroutinefunction(func):
+                # A native coroutine, which Django runs on the event loop under ASGI without a thread handoff
+                @wraps(func)
+                async def wrapper(request, *args, **kwargs):
+                    consumer = await self.aaccess_control(request, permissions, aggregation_type)
 
-                if consumer_parma_name:
-                    kwargs[consumer_parma_name] = consumer
-                return func(request, *args, **kwargs)
+                    if consumer_parma_name:
+                        kwargs[consumer_parma_name] = consumer
+                    return await func(request, *args, **kwargs)
 
-            # Make parameters to override signature
-            updated_parameters = [
-                *filter(
-                    lambda p: p.annotation is not consumer_class,
-                    func_signature.parameters.values(),
+            else:
+
+                @wraps(func)
+                def wrapper(request, *args, **kwargs):
+                    consumer = self.access_control(request, permissions, aggregation_type)
+
+                    if consumer_parma_name:
+                        kwargs[consumer_parma_name] = consumer
+                    return func(request, *args, **kwargs)
+
+            if consumer_parma_name:
+                # Override signature to hide the injected consumer. Otherwise, the signature of `func` is exposed
+                # through `__wrapped__`, so it's needless to build one for each view at startup.
+                func_signature = signature(func)
+                wrapper.__signature__ = func_signature.replace(
+                    parameters=tuple(p for p in func_signature.parameters.values() if p.name != consumer_parma_name)
                 )
-            ]
-            # Override signature
-            wrapper.__signature__ = func_signature.replace(parameters=tuple(updated_parameters))
-            self.context.logger.debug(f'Wrapped view {func}, which require permissions `{permissions}`')
+            self.context.logger.debug('Wrapped view %s, which require permissions `%s`', func, permissions)
 
             return wrapper
 
@@ -77,11 +78,4 @@ class DjangoBridge(WebBridge):
         if not _token:
             raise AuthException(message='Unauthorized', code=ErrorCode.UNAUTHORIZED)
 
-        jwt_payload = self.decode_jwt_token(_token)
-        user = JWTUser(**jwt_payload)
-        return Consumer(
-            permission_bitmask=jwt_payload['permission_bitmask'],
-            user=user,
-            auth_scheme='JWT',
-            credential=_token,
-        )
+        return self.authenticate_jwt_token(_token)
@@ -1,3 +1,4 @@
 from .bridge import FastapiBridge
+from .middleware import AuthorizationMiddleware
 
-_ = (FastapiBridge,)
+_ = (FastapiBridge, AuthorizationMiddleware)
@@ -1,22 +1,23 @@
 from functools import wraps
 from inspect import Parameter, signature
-from typing import Type
 
 from fastapi import Depends, Request
 from fastapi.security import HTTPBearer
 
-from web_auth import AuthException, Consumer, Context, ErrorCode, JWTUser, PermissionAggregationTypeEnum, WebBridge
+from web_auth import AuthException, Consumer, Context, ErrorCode, PermissionAggregationTypeEnum, WebBridge
 
 
 class FastapiBridge(WebBridge):
     def __init__(self, context: Context):
         super().__init__(context)
+        self._http_bearer = Depends(HTTPBearer(auto_error=False))  # shared by the wrapped views
 
     def create_view_func_wrapper(
         self, permissions: set[str], aggregation_type: PermissionAggregationTypeEnum
     ) -> callable:
         """Factory method. Creates a callable object to wrap view functions and require certain permissions to perform.
         """
+        http_bearer = self._http_bearer
 
         def decorator(func):
             func_signature = signature(func)
@@ -24,27 +25,17 @@ class FastapiBridge(WebBridge):
                 (k for k, v in func_signature.parameters.items() if v.annotation is Request), None
             )
 
-            consumer_class: Type[Consumer] = self.consumer_class
-            consumer_parma_name = next(
-                (
-                    k
-                    for k, v in func_signature.parameters.items()
-                    if issubclass(v.annotation, Consumer) or v.annotation is consumer_class
-                ),
-                None,
-            )
+            consumer_parma_name = self.get_consumer_parameter_name(func)
             if consumer_parma_name:
                 self.context.logger.debug(
-                    f'declare parameter `{consumer_parma_name}` with type {consumer_class} in view `{func}`'
+                    'declare parameter `%s` with type %s in view `%s`', consumer_parma_name, self.consumer_class, func
                 )
 
             @wraps(func)
-            async def wrapper(
-                _request_: Request = None, _http_bearer_=Depends(HTTPBearer(auto_error=False)), *args, **kwargs
-            ):
+            async def wrapper(_request_: Request = None, _http_bearer_=http_bearer, *args, **kwargs):
                 if request_parma_name:
                     kwargs[request_parma_name] = _request_
-                consumer: Consumer = self.access_control(_request_, permissions, aggregation_type)
+                consumer: Consumer = await self.aaccess_control(_request_, permissions, aggregation_type)
                 if consumer_parma_name:
                     kwargs[consumer_parma_name] = consumer
                 return await func(*args, **kwargs)
@@ -52,16 +43,14 @@ class FastapiBridge(WebBridge):
             # Make parameters to override signature
             http_bearer_params = (
                 [
-                    Parameter(
-                        '_http_bearer_', Parameter.POSITIONAL_OR_KEYWORD, default=Depends(HTTPBearer(auto_error=False))
-                    ),
+                    Parameter('_http_bearer_', Parameter.POSITIONAL_OR_KEYWORD, default=http_bearer),
                 ]
                 if consumer_parma_name
                 else []
             )
             updated_parameters = [
                 *filter(
-                    lambda p: p.annotation is not consumer_class,
+                    lambda p: p.name != consumer_parma_name,
                     func_signature.parameters.values(),
                 ),
                 Parameter('_request_', Parameter.POSITIONAL_OR_KEYWORD, annotation=Request, default=None),
@@ -69,7 +58,7 @@ class FastapiBridge(WebBridge):
             ]
             # Override signature
             wrapper.__signature__ = func_signature.replace(parameters=tuple(updated_parameters))
-            self.context.logger.debug(f'Wrapped view {func}, which require permissions `{permissions}`')
+            self.context.logger.debug('Wrapped view %s, which require permissions `%s`', func, permissions)
 
             return wrapper
 
@@ -90,11 +79,4 @@ class FastapiBridge(WebBridge):
         if not _token:
             raise AuthException(message='Unauthorized', code=ErrorCode.UNAUTHORIZED)
 
-        jwt_payload = self.decode_jwt_token(_token)
-        user = JWTUser(**jwt_payload)
-        return Consumer(
-            permission_bitmask=jwt_payload['permission_bitmask'],
-            user=user,
-            auth_scheme='JWT',
-            credential=_token,
-        )
+        return self.authenticate_jwt_token(_token)
@@ -0,0 +1,146 @@
+import json
+import re
+from typing import Iterable, Optional, Pattern, Union
+from urllib.parse import parse_qsl
+
+from web_auth import (
+    AuthException,
+    BitmaskAuthorization,
+    Config,
+    Consumer,
+    Context,
+    ErrorCode,
+    PermissionAggregationTypeEnum,
+    RequiredPermissions,
+    WebBridge,
+)
+
+RouteRequirement = Union[str, Iterable[str], tuple[Union[str, Iterable[str]], PermissionAggregationTypeEnum]]
+
+
+class AuthorizationMiddleware(object):
+    """A pure ASGI middleware that authorizes requests before the framework routes them, so unauthorized requests
+    are rejected with a 401/403 before any `Request`, dependency or view is created.
+
+    The `routes` map (method, path) to the required permissions, or to a (permissions, aggregation type) pair. A path
+    may contain `{param}` and `{param:path}` placeholders, and the method `*` matches any method. A route requiring no
+    permissions, e.g. `[]`, still requires an authenticated consumer. Requests matching no route are passed through,
+    so they can still be protected by the view decorators::
+
+        app.add_middleware(
+            AuthorizationMiddleware,
+            routes={
+                ('GET', '/tickets'): 'view_ticket',
+                ('DELETE', '/tickets/{ticket_id}'): (['delete_ticket', 'admin'], PermissionAggregationTypeEnum.ANY),
+            },
+        )
+
+    The token is read from the raw `Authorization` header, or the `access_token` query parameter. The authorized
+    consumer is put in `scope['state']['consumer']`, i.e. `request.state.consumer`.
+    """
+
+    UNAUTHORIZED_CODES = frozenset({ErrorCode.UNAUTHORIZED, ErrorCode.BAD_JWT})
+
+    def __init__(
+        self,
+        app,
+        routes: dict[tuple[str, str], RouteRequirement],
+        context: Optional[Context] = None,
+    ):
+        self.app = app
+        self.context = context or Config.get_globals_context() or Config.configure()
+        self.bridge: WebBridge = self.context.bridge
+        self.exact_routes: dict[tuple[str, str], RequiredPermissions] = {}
+        self.pattern_routes: list[tuple[str, Pattern, RequiredPermissions]] = []
+        for (method, path), requirement in routes.items():
+            self.add_route(method, path, requirement)
+
+    def add_route(self, method: str, path: str, requirement: RouteRequirement):
+        if (
+            isinstance(requirement, tuple)
+            and requirement
+            and isinstance(requirement[-1], PermissionAggregationTypeEnum)
+        ):
+            required_permissions, aggregation_type = requirement
+        else:
+            required_permissions, aggregation_type = requirement, PermissionAggregationTypeEnum.ALL
+        # Shared with the views requiring the same permissions, so the mask is compiled once per storage version
+        permissions = self.context._get_required_permissions(  # pylint: disable=protected-access
+            required_permissions, aggregation_type
+        )
+
+        method = method.upper()
+        if '{' not in path:
+            self.exact_routes[(method, path)] = permissions
+            return
+
+        pattern = ''
+        for i, part in enumerate(re.split(r'{([^}]+)}', path)):
+            pattern += re.escape(part) if i % 2 == 0 else ('.+' if part.endswith(':path') else '[^/]+')
+        self.pattern_routes.append((method, re.compile(f'{pattern}$'), permissions))
+
+    def match(self, method: str, path: str) -> Optional[RequiredPermissions]:
+        # An empty `RequiredPermissions` is falsy, but it's a route requiring authentication
+        exact_routes = self.exact_routes
+        permissions = exact_routes.get((method, path))
+        if permissions is None:
+            permissions = exact_routes.get(('*', path))
+        if permissions is not None:
+            return permissions
+        for route_method, pattern, permissions in self.pattern_routes:
+            if (route_method == method or route_method == '*') and pattern.match(path):
+                return permissions
+        return None
+
+    @staticmethod
+    def extract_token(scope) -> Optional[str]:
+        for name, value in scope['headers']:
+            if name == b'authorization':
+                token = WebBridge.extract_from_bearer_token(value.decode('latin-1'))
+                if token:
+                    return token
+                break
+
+        query_string = scope.get('query_string')
+        if query_string and b'access_token=' in query_string:
+            return dict(parse_qsl(query_string.decode('latin-1'))).get('access_token')
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        permissions = self.match(scope['method'], scope['path'])
+        if permissions is None:
+            return await self.app(scope, receive, send)
+
+        try:
+            consumer = await self.authorize(scope, permissions)
+        except AuthException as exception:
+            status = 401 if exception.code in self.UNAUTHORIZED_CODES else 403
+            return await self.send_error(send, status, exception)
+
+        scope.setdefault('state', {})['consumer'] = consumer
+        return await self.app(scope, receive, send)
+
+    async def authorize(self, scope, permissions: RequiredPermissions) -> Consumer:
+        token = self.extract_token(scope)
+        if not token:
+            raise AuthException(message='Unauthorized', code=ErrorCode.UNAUTHORIZED)
+
+        consumer = await self.bridge.aauthenticate_jwt_token(token)
+        authorization: BitmaskAuthorization = self.bridge.get_authorization_class()(context=self.context)
+        await authorization.aauthorize(consumer, permissions, permissions.aggregation_type)
+        return consumer
+
+    @staticmethod
+    async def send_error(send, status: int, exception: AuthException):
+        body = json.dumps({'code': exception.code, 'message': exception.message}).encode()
+        await send(
+            {
+                'type': 'http.response.start',
+                'status': status,
+                'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+            }
+        )
+        await send({'type': 'http.response.body', 'body': body})